@@ -0,0 +1,181 @@
+# Times discovery, conflict checking, resolution and file output on synthetic dependency graphs
+# served by an in-process fake registry backend.
+# usage: python benchmarks/bench_resolve.py [--sizes 50 500 5000] [--latency MS] [--failure-rate P] [--output FILE]
+import argparse
+import atexit
+import copy
+from datetime import datetime, timedelta, timezone
+import json
+import pathlib
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from rich.console import Console
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+import main
+
+CHAIN_LENGTH = 10
+MAJOR_VERSIONS = [1, 2, 3]
+MINOR_VERSIONS = [0, 1, 2]
+
+# region . FakeRegistryBackend
+class FakeRegistryBackend:
+    fetches_whole_packument = True
+
+    def __init__(self, packuments, latency=0.0, failure_rate=0.0, seed=0):
+        self.packuments = packuments
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests, self.failures = 0, 0
+
+    def request(self, dependency):
+        # injected failures are transient, so the request scheduler retries them
+        time.sleep(self.latency)
+        with self.lock:
+            self.requests += 1
+            failed = self.random.random() < self.failure_rate
+            self.failures += failed
+        if failed: raise main.TransientRegistryError(f"{dependency}: injected failure")
+        if dependency not in self.packuments: raise main.RegistryError(f"{dependency}: HTTP 404")
+        return self.packuments[dependency]
+
+    def fetch_packument(self, dependency, full=False):
+        packument = self.request(dependency)
+        return {key: value for key, value in packument.items() if full or key != "time"}
+
+    def fetch_manifest(self, dependency, version):
+        return self.fetch_packument(dependency)
+
+# region . generate_graph
+def generate_graph(size, seed=0):
+    # chains of peerDependencies where every major only accepts the same major of the next link;
+    # every fifth chain has a root package whose latest version pins the chain tail to an older
+    # major, which forces a downgrade cascade back up the whole chain
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    packuments, dependencies = {}, []
+    chains = [[f"pkg-{index:05d}" for index in range(start, min(start + CHAIN_LENGTH, size))] for start in range(0, size, CHAIN_LENGTH)]
+    for chain_index, chain in enumerate(chains):
+        pinning_package = chain.pop() if chain_index % 5 == 0 and len(chain) > 1 else None
+        for position, dependency in enumerate(chain):
+            next_dependency = chain[position + 1] if position + 1 < len(chain) else None
+            versions = [f"{major}.{minor}.0" for major in MAJOR_VERSIONS for minor in MINOR_VERSIONS]
+            published_days_ago = rng.choice([30, 90, 800])
+            packuments[dependency] = {
+                "versions": versions,
+                "dist-tags": {"latest": versions[-1]},
+                "time": {
+                    "modified": now.isoformat(),
+                    **{version: (now - timedelta(days=published_days_ago + len(versions) - index)).isoformat().replace("+00:00", "Z") for index, version in enumerate(versions)},
+                },
+                "manifests": {
+                    version: {"peerDependencies": {next_dependency: f"^{version.split(".")[0]}.0.0"}} if next_dependency else {}
+                    for version in versions
+                },
+            }
+        dependencies.append(chain[0])
+        if pinning_package:
+            versions = ["1.0.0", "2.0.0"]
+            packuments[pinning_package] = {
+                "versions": versions,
+                "dist-tags": {"latest": "2.0.0"},
+                "time": {"modified": now.isoformat(), "1.0.0": now.isoformat(), "2.0.0": now.isoformat()},
+                "manifests": {version: {"peerDependencies": {chain[-1]: f"^{MAJOR_VERSIONS[-2]}.0.0"}} for version in versions},
+            }
+            dependencies.append(pinning_package)
+    return packuments, dependencies
+
+# region . timed
+def timed(timings, phase, function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    timings[phase] = round(time.perf_counter() - start, 6)
+    return result
+
+# region . benchmark
+def benchmark(size, latency, failure_rate, solver):
+    packuments, dependencies = generate_graph(size)
+    backend = FakeRegistryBackend(packuments, latency=latency, failure_rate=failure_rate)
+    timings = {}
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        package_directory = pathlib.Path(temporary_directory)
+        main.METADATA_BACKENDS["fake"] = lambda: backend
+        main.SETTINGS.update({"backend": "fake", "solver": solver, "cache_directory": package_directory / "cache", "refreshed_before": 0})
+        main.get_npm_cache_store.cache_clear()
+        main.get_metadata_backends.cache_clear()
+        main.get_request_scheduler.cache_clear()
+        main.get_version_index.cache_clear()
+
+        try:
+            timed(timings, "prefetch", main.prefetch_dependency_graph, dependencies)
+            package = {}
+
+            def _discover(package):
+                for dependency in dependencies:
+                    package = main.add_recursive_dependency_to_package(package, dependency, required_by="<root>")
+                return package
+
+            package = timed(timings, "discovery", _discover, package)
+            conflicts = timed(timings, "conflict_check", lambda: main.ConflictChecker(package).check())
+            package, resolved = timed(timings, "resolution", main.resolve_package, copy.deepcopy(package))
+
+            def _write(package):
+                main.write_package_peerDependencies(package_directory, package)
+                main.write_package_versions(package_directory, package)
+
+            timed(timings, "file_output", _write, package)
+            error = None
+        except main.RegistryError as registry_error:
+            package, conflicts, resolved, error = {}, [], False, str(registry_error)
+        cache = main.get_npm_cache_store()
+        atexit.unregister(cache.flush)
+        cache.flush()
+        cache.connection.close()
+
+    return {
+        "size": size,
+        "dependencies": len(package),
+        "initial_conflicts": len(conflicts),
+        "resolved": resolved,
+        "registry_requests": backend.requests,
+        "registry_failures": backend.failures,
+        "error": error,
+        "seconds": {**timings, "total": round(sum(timings.values()), 6)},
+    }
+
+# region -
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--latency", type=float, default=0.0, help="milliseconds per fake registry request")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="probability that a fake registry request fails")
+    parser.add_argument("--solver", choices=["greedy", "backtrack"], default="greedy")
+    parser.add_argument("--output", type=pathlib.Path, default=pathlib.Path("bench_resolve.json"))
+    args = parser.parse_args()
+
+    main.console = Console(quiet=True)
+    results = []
+    for size in args.sizes:
+        result = benchmark(size, args.latency / 1000, args.failure_rate, args.solver)
+        results.append(result)
+        phases = "  ".join(f"{phase} {seconds:.3f}s" for phase, seconds in result["seconds"].items())
+        print(f"{size:>6} packages  {result["registry_requests"]:>5} requests  resolved={result["resolved"]}  {phases}")
+        if result["error"]: print(f"        error: {result["error"]}")
+
+    with open(args.output, "w") as file:
+        json.dump({
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "latency_ms": args.latency,
+            "failure_rate": args.failure_rate,
+            "solver": args.solver,
+            "results": results,
+        }, file, indent=4)
+    print(f"wrote {args.output}")
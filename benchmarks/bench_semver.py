@@ -0,0 +1,106 @@
+# Compares check_version_compatibility against the pre-compiled-range implementation.
+# usage: python benchmarks/bench_semver.py [--repeat N]
+import argparse
+import pathlib
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+import main
+
+# region . legacy_check_version_compatibility
+def legacy_check_version_compatibility(semver_version, semver_requirements):
+
+    def range_intersection(range1, range2):
+        min1, max1 = range1
+        min2, max2 = range2
+        min_ = max(min1, min2)
+        max_ = max2 if max1 == "inf" else max1 if max2 == "inf" else min(max1, max2)
+        if max_ != "inf" and min_ >= max_: return None
+        return min_, max_
+
+    def _semver_to_tuple(semver):
+        if semver == "": return None
+        semver = re.sub(r"[-+].*$", "", semver).replace("*", "x")
+        match = re.match(r"^(\^|~|>=|<=|>|<|=)", semver)
+        symbol, version = (match.group(), semver[match.end():]) if match else ("=", semver)
+        parts = version.split(".")
+        parts += ["x"] * (3 - len(parts))
+        parts = [int(p) if p.isdigit() else None for p in parts]
+        return symbol, parts
+
+    def _get_range(semver):
+        def _semver_range(semver):
+            symbol, parts = _semver_to_tuple(semver) if type(semver) is str else semver
+            major, minor, patch = parts
+            if major is None: return [0, 0, 0], [None, None, None]
+            if symbol == "^":
+                if major > 0: return parts, [major + 1, 0, 0]
+                if minor > 0: return parts, [0, 1 + (minor or 0), 0]
+                return parts, [0, 0, patch + 1]
+            if symbol == "<": return [0, 0, 0], parts
+            if symbol == "~": return parts, [major, 1 + (minor or 0), 0]
+            if symbol == ">=": return parts, [None, None, None]
+            def _increment_version(parts):
+                major, minor, patch = parts
+                if patch is not None: return [major, minor, patch + 1]
+                if minor is not None: return [major, minor + 1, 0]
+                return [major + 1, 0, 0]
+            if symbol == "<=": return [0, 0, 0], _increment_version(parts)
+            if symbol == "=": return parts, _increment_version(parts)
+            if symbol == ">": return _increment_version(parts), [None, None, None]
+        min_, max_ = _semver_range(semver)
+        def _nones_to_zeros(parts): return [0 if p is None else p for p in parts]
+        def _nones_to_inf(parts): return "inf" if all(p is None for p in parts) else parts
+        return _nones_to_zeros(min_), _nones_to_inf(max_)
+
+    def _is_version_in_range(version_parts, range_):
+        min_, max_ = range_
+        if version_parts < min_: return False
+        if max_ != "inf" and version_parts >= max_: return False
+        return True
+
+    _, version_parts = _semver_to_tuple(semver_version)
+    greater_than = True
+    for semver_requirement in semver_requirements.split(" || "):
+        semver_tuples = [_semver_to_tuple(semver) for semver in (semver_requirement.strip() + " ").split(" ")[:2]]
+        ranges = [_get_range(semver_tuple) for semver_tuple in semver_tuples if semver_tuple is not None]
+        range_ = range_intersection(ranges[0], ranges[1]) if len(ranges) == 2 else ranges[0]
+        if _is_version_in_range(version_parts, range_): return True, None
+        if version_parts <= range_[0]: greater_than = False
+    return False, greater_than
+
+# region . benchmark
+def benchmark(check, pairs, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for version, requirements in pairs:
+            check(version, requirements)
+    return time.perf_counter() - start
+
+# region -
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(0)
+    versions = [f"{major}.{minor}.{patch}" for major in range(20) for minor in range(10) for patch in range(5)]
+    requirements = [
+        "^16.8.0 || ^17.0.0 || ^18.0.0", ">=1.2.3 <2.0.0", "~4.1.0", "^0.14.0", ">=5",
+        "<=9.4.0", "^3.0.0 || ^4.0.0", "=7.2.1", "1.x", "*",
+    ]
+    # the downgrade loop and binary search probe the same requirement strings over and over
+    pairs = [(random.choice(versions), random.choice(requirements)) for _ in range(20_000)]
+
+    mismatches = sum(legacy_check_version_compatibility(*pair) != main.check_version_compatibility(*pair) for pair in pairs)
+    legacy_seconds = benchmark(legacy_check_version_compatibility, pairs, args.repeat)
+    compiled_seconds = benchmark(main.check_version_compatibility, pairs, args.repeat)
+    checks = len(pairs) * args.repeat
+    print(f"checks:   {checks}")
+    print(f"legacy:   {legacy_seconds:.3f}s ({legacy_seconds / checks * 1e6:.2f}us/check)")
+    print(f"compiled: {compiled_seconds:.3f}s ({compiled_seconds / checks * 1e6:.2f}us/check)")
+    print(f"speedup:  {legacy_seconds / compiled_seconds:.1f}x")
+    print(f"mismatching results: {mismatches}")
@@ -0,0 +1,67 @@
+# Measures the cold start of main.py: `python -X importtime` cost of importing it and wall time of `--help`.
+# usage: python benchmarks/bench_startup.py [--repeat N] [--top N] [--output FILE]
+import argparse
+import json
+import pathlib
+import statistics
+import subprocess
+import sys
+import time
+
+PACKAGE_DIRECTORY = pathlib.Path(__file__).resolve().parents[1]
+
+# region . measure_importtime
+def measure_importtime():
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=PACKAGE_DIRECTORY, capture_output=True, text=True, check=True,
+    )
+    modules, direct_imports = {}, {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line: continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        # an import is listed after everything it imported, indented two spaces deeper
+        depth = (len(module) - len(module.lstrip()) - 1) // 2
+        if depth == 1: direct_imports[module.strip()] = int(cumulative_us)
+        if depth == 0:
+            if module.strip() == "main": modules = {"main": int(cumulative_us), **direct_imports}
+            direct_imports = {}
+    return modules
+
+# region . measure_help
+def measure_help():
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "main.py", "--help"], cwd=PACKAGE_DIRECTORY, capture_output=True, check=True)
+    return time.perf_counter() - start
+
+# region -
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--output", type=pathlib.Path, default=None)
+    args = parser.parse_args()
+
+    measure_importtime()  # warm the bytecode cache
+    runs = [measure_importtime() for _ in range(args.repeat)]
+    main_us = statistics.median(run["main"] for run in runs)
+    top_modules = sorted(
+        ((module, statistics.median(run.get(module, 0) for run in runs)) for module in runs[0] if module != "main"),
+        key=lambda item: -item[1],
+    )[:args.top]
+    help_seconds = statistics.median(measure_help() for _ in range(args.repeat))
+
+    print(f"import main: {main_us / 1000:.1f}ms (median of {args.repeat})")
+    for module, cumulative_us in top_modules:
+        print(f"  {module:<30} {cumulative_us / 1000:>7.1f}ms")
+    print(f"main.py --help: {help_seconds * 1000:.1f}ms")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({
+                "python": sys.version.split()[0],
+                "import_main_ms": main_us / 1000,
+                "top_imports_ms": {module: cumulative_us / 1000 for module, cumulative_us in top_modules},
+                "help_ms": help_seconds * 1000,
+            }, file, indent=4)
+        print(f"wrote {args.output}")
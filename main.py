@@ -1,30 +1,97 @@
 # from get_project_root import get_project_root
-from datetime import datetime, timezone, timedelta
-from InquirerPy import inquirer
+import atexit
+import base64
+import bisect
+import contextlib
+from datetime import datetime, timezone
+import fcntl
+import fnmatch
+import functools
+import gzip
+import hashlib
+import io
 import json
-from packaging.version import parse
+import os
 import pathlib
+import random
 import re
-from rich.console import Console
 import shutil
+import signal
+import sqlite3
 import subprocess
+import threading
+import time
 import typer
+import urllib.parse
+import zlib
 
+# region . get_project_root
+@functools.cache
 def get_project_root():
-    for parent_path in pathlib.Path(__file__).resolve().parents:
-        if (parent_path / ".gitlab-ci.yml").exists():
-            project_root: pathlib.PosixPath = parent_path
-            return project_root
-    raise FileNotFoundError("""
+    if SETTINGS["root"] is not None: return SETTINGS["root"].resolve()
+    search_paths = [pathlib.Path.cwd(), *pathlib.Path.cwd().parents, *pathlib.Path(__file__).resolve().parents]
+    for marker in PROJECT_ROOT_MARKERS:
+        for parent_path in search_paths:
+            if (parent_path / marker).exists():
+                project_root: pathlib.PosixPath = parent_path
+                return project_root
+    raise FileNotFoundError(f"""
         Outside of scope for finding a project root.
-        No `.gitlab-ci.yml` found while traversing up directory tree.
+        None of {PROJECT_ROOT_MARKERS} found while traversing up directory tree; pass --root.
     """)
 
-console = Console()
+# region . LazyConsole
+class LazyConsole:
+    # rich is only imported once something is printed
+    def __getattr__(self, name):
+        global console
+        from rich.console import Console
+        console = Console()
+        return getattr(console, name)
+
+console = LazyConsole()
 app = typer.Typer()
 
-PROJECT_ROOT = get_project_root()
-TEMP_FILES = ["package-backup.json", "package-versions.json", "package-peerDependencies.json", ".npm_cache.json"]
+PROJECT_ROOT_MARKERS = [".gitlab-ci.yml", "pnpm-workspace.yaml", ".git"]
+SEMVER_VERSION_PATTERN = re.compile(r"[=v]*(\d+)\.(\d+)\.(\d+)(?:-([0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?")
+SEMVER_PARTIAL_PATTERN = re.compile(r"(\d+|[xX*])?(?:\.(\d+|[xX*]))?(?:\.(\d+|[xX*]))?(?:-([0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?")
+MIN_VERSION_KEY = (0, 0, 0, 0, ((0, 0, ""),))
+MAX_VERSION_KEY = (float("inf"), 0, 0, 0, ())
+PACKUMENT_VERSION_FIELDS = ["peerDependencies", "peerDependenciesMeta"]
+VOLATILE_FIELDS = ["versions", "dist-tags", "last-publish"]
+NPM_CACHE_FILE = "npm_cache.sqlite"
+DISCOVERY_CACHE_FILE = "discovery.json"
+NPM_CACHE_BATCH_SIZE = 64
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 30
+LEGACY_NPM_CACHE_FILE = ".npm_cache.json"
+PACKAGE_SNAPSHOT_FILE = "package-snapshot.json"
+PACKAGE_DIFF_FILE = "package-diff.json"
+SKIP_DIRECTORIES = {
+    "node_modules", "__pycache__", ".git", ".idea", ".vscode",
+    "dist", "build", "venv", ".venv",
+}
+TEMP_FILES = ["package-backup.json", "package-versions.json", "package-peerDependencies.json", PACKAGE_SNAPSHOT_FILE, PACKAGE_DIFF_FILE, LEGACY_NPM_CACHE_FILE]
+
+SETTINGS = {
+    "root": None,
+    "cache_directory": pathlib.Path(os.environ.get("XDG_CACHE_HOME", pathlib.Path.home() / ".cache")) / "update-package-json",
+    "cache_max_megabytes": 256,
+    "ttl": {"versions": 24 * 3600, "dist-tags": 24 * 3600, "last-publish": 7 * 24 * 3600},
+    "stale_after_days": 365,
+    "refreshed_before": 0,
+    "inflight_directory": None,
+    "lockfile": False,
+    "offline": False,
+    "incremental": False,
+    "concurrency": 8,
+    "requests_per_second": 0,
+    "retries": 3,
+    "backend": "auto",
+    "solver": "greedy",
+}
+
+LOCAL_PACKAGES = {}
 
 # TODO: handle stale dependencies
 STALE_DEPENDENCIES_FILE = "<placeholder>.json"
@@ -37,32 +104,154 @@ STALE_DEPENDENCIES_FILE = "<placeholder>.json"
 
 
 # region -
+# region . read_workspace_patterns
+def read_workspace_patterns():
+    patterns = []
+    package_path = get_project_root() / "package.json"
+    if package_path.exists():
+        with open(package_path, "r") as file:
+            workspaces = json.load(file).get("workspaces", [])
+        patterns.extend(workspaces.get("packages", []) if type(workspaces) is dict else workspaces)
+    pnpm_workspace_path = get_project_root() / "pnpm-workspace.yaml"
+    if pnpm_workspace_path.exists():
+        in_packages = False
+        for line in pnpm_workspace_path.read_text().splitlines():
+            if not line.strip() or line.lstrip().startswith("#"): continue
+            if not line[0].isspace(): in_packages = line.startswith("packages:")
+            elif in_packages and line.strip().startswith("-"): patterns.append(line.strip()[1:].strip().strip("'\""))
+    return patterns
+
+# region . read_gitignore_patterns
+def read_gitignore_patterns():
+    gitignore_path = get_project_root() / ".gitignore"
+    if not gitignore_path.exists(): return []
+    patterns = []
+    for line in gitignore_path.read_text().splitlines():
+        line = line.strip()
+        if not line or line.startswith(("#", "!")): continue
+        patterns.append(line.rstrip("/"))
+    return patterns
+
+# region . is_ignored_directory
+def is_ignored_directory(relative_directory, gitignore_patterns):
+    name = relative_directory.rsplit("/", 1)[-1]
+    if name in SKIP_DIRECTORIES: return True
+    for pattern in gitignore_patterns:
+        if "/" in pattern:
+            if fnmatch.fnmatch(relative_directory, pattern.lstrip("/")): return True
+        elif fnmatch.fnmatch(name, pattern):
+            return True
+    return False
+
+# region . match_workspace_pattern
+def match_workspace_pattern(relative_path, pattern):
+    # glob semantics: "*" and "?" stay within one path segment, "**" spans any number of them
+    regex = "".join(
+        "(?:.*/)?" if part == "**/" else ".*" if part == "**" else "[^/]*" if part == "*" else "[^/]" if part == "?" else re.escape(part)
+        for part in re.split(r"(\*\*/|\*\*|\*|\?)", pattern) if part
+    )
+    return re.fullmatch(regex, relative_path) is not None
+
+# region . find_workspace_packages
+def find_workspace_packages(workspace_patterns):
+    # the workspace globs are matched against the pruned, cached walk, so node_modules and ignored directories are never entered
+    project_root = get_project_root()
+    included_patterns = [f"{pattern.strip("/")}/package.json" for pattern in workspace_patterns if not pattern.startswith("!")]
+    excluded_patterns = [f"{pattern[1:].strip("/")}/package.json" for pattern in workspace_patterns if pattern.startswith("!")]
+    results = {project_root / "package.json"} if (project_root / "package.json").exists() else set()
+    for package_path in walk_packages():
+        relative_path = str(package_path.relative_to(project_root))
+        if not any(match_workspace_pattern(relative_path, pattern) for pattern in included_patterns): continue
+        if any(match_workspace_pattern(relative_path, pattern) for pattern in excluded_patterns): continue
+        results.add(package_path)
+    return sorted(results, key=lambda package_path: package_path.parent.parts)
+
+# region . find_git_packages
+def find_git_packages():
+    project_root = get_project_root()
+    try:
+        process = subprocess.run(
+            ["git", "-C", str(project_root), "ls-files", "-z", "--cached", "--others", "--exclude-standard", "--", "package.json", "**/package.json"],
+            capture_output=True, text=True,
+        )
+    except OSError:
+        return None
+    if process.returncode != 0: return None
+    results = set()
+    for relative_path in process.stdout.split("\0"):
+        if not relative_path: continue
+        package_path = project_root / relative_path
+        if SKIP_DIRECTORIES.intersection(package_path.relative_to(project_root).parts[:-1]): continue
+        if package_path.exists(): results.add(package_path)
+    return sorted(results, key=lambda package_path: package_path.parent.parts)
+
+# region . walk_packages
+def walk_packages():
+    # a directory's mtime changes whenever an entry is added, removed or renamed in it,
+    # so unchanged directories can reuse their cached listing without being scanned again
+    project_root = get_project_root()
+    discovery_cache_path = SETTINGS["cache_directory"] / DISCOVERY_CACHE_FILE
+    try:
+        with open(discovery_cache_path, "r") as file:
+            discovery_cache = json.load(file)
+    except (OSError, ValueError):
+        discovery_cache = {}
+    previous_listings = discovery_cache.get(str(project_root), {})
+    gitignore_patterns = read_gitignore_patterns()
+    listings, results, frontier = {}, [], [""]
+    while frontier:
+        relative_directory = frontier.pop()
+        directory_path = os.path.join(project_root, relative_directory)
+        try:
+            mtime = os.stat(directory_path).st_mtime_ns
+            if relative_directory in previous_listings and previous_listings[relative_directory][0] == mtime:
+                listings[relative_directory] = previous_listings[relative_directory]
+            else:
+                with os.scandir(directory_path) as entries:
+                    entries = list(entries)
+                listings[relative_directory] = [
+                    mtime,
+                    [entry.name for entry in entries if entry.is_dir(follow_symlinks=False)],
+                    any(entry.name == "package.json" and entry.is_file() for entry in entries),
+                ]
+        except OSError:
+            continue
+        _, directories, has_package = listings[relative_directory]
+        if has_package: results.append(project_root / relative_directory / "package.json")
+        for directory in directories:
+            relative_subdirectory = f"{relative_directory}/{directory}" if relative_directory else directory
+            if not is_ignored_directory(relative_subdirectory, gitignore_patterns): frontier.append(relative_subdirectory)
+    if listings != previous_listings:
+        discovery_cache[str(project_root)] = listings
+        discovery_cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(discovery_cache_path, "w") as file:
+            file.write(json.dumps(discovery_cache, separators=(",", ":")))
+    return sorted(results, key=lambda package_path: package_path.parent.parts)
+
 # region . find_packages
 def find_packages():
-    skip_directories = {
-        "node_modules", "__pycache__", ".git", ".idea", ".vscode",
-        "dist", "build", "venv", ".venv",
-    }
-    results: list[pathlib.PosixPath] = []
-    for directory_path, directories, files in PROJECT_ROOT.walk(top_down=True, follow_symlinks=False):
-        directories[:] = [directory for directory in directories if directory not in skip_directories]
-        if "package.json" in files: results.append(directory_path / "package.json")
-    return results
+    workspace_patterns = read_workspace_patterns()
+    if workspace_patterns: return find_workspace_packages(workspace_patterns)
+    package_paths = find_git_packages()
+    if package_paths is None: package_paths = walk_packages()
+    return package_paths
 
 # region . select_package
 def select_package():
-    package_paths = find_packages()
+    with PROFILER.span("phase", "find_packages"):
+        package_paths = find_packages()
     if len(package_paths) == 0:
         console.print("[red]No package.json files found in the project.[/red]")
         raise typer.Exit()
+    from InquirerPy import inquirer
     selected_package = inquirer.select(
         message="\nSelect a package.json to update:",
-        choices=[str(package_path.relative_to(PROJECT_ROOT)) for package_path in package_paths] + ["EXIT"],
+        choices=[str(package_path.relative_to(get_project_root())) for package_path in package_paths] + ["EXIT"],
     ).execute()
     if selected_package == "EXIT":
         console.print("[orange]exiting[/orange]")
         raise typer.Exit()
-    return (PROJECT_ROOT / pathlib.Path(selected_package)).parent
+    return (get_project_root() / pathlib.Path(selected_package)).parent
 
 # region . backup_package
 def backup_package(package_directory: pathlib.PosixPath):
@@ -75,6 +264,88 @@ def backup_package(package_directory: pathlib.PosixPath):
 
 
 
+# region -
+# region PROFILING
+
+
+
+
+
+# region . Profiler
+class Profiler:
+    def __init__(self):
+        self.spans = []
+        self.local = threading.local()
+
+    @contextlib.contextmanager
+    def span(self, category, name, **args):
+        stack = self.local.__dict__.setdefault("stack", [])
+        stack.append(args)
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self.record(category, name, start, **args)
+            stack.pop()
+
+    def record(self, category, name, start, **args):
+        # list.append is atomic, so worker threads can record without a lock
+        self.spans.append((category, name, args, os.getpid(), threading.get_ident(), start, time.perf_counter() - start))
+
+    def add(self, **counters):
+        stack = self.local.__dict__.get("stack")
+        if not stack: return
+        for counter, value in counters.items():
+            stack[-1][counter] = stack[-1].get(counter, 0) + value
+
+    def write_trace(self, trace_path: pathlib.PosixPath):
+        with open(trace_path, "w") as file:
+            json.dump({"traceEvents": [
+                {"name": name, "cat": category, "ph": "X", "ts": start * 1e6, "dur": seconds * 1e6, "pid": pid, "tid": thread, "args": args}
+                for category, name, args, pid, thread, start, seconds in self.spans
+            ]}, file)
+        console.print(f"wrote Chrome trace: {trace_path}")
+
+PROFILER = Profiler()
+
+# region . print_profile
+def print_profile(top=15):
+    from rich.table import Table
+    phases, packages = {}, {}
+    cache_hits = cache_lookups = retries = coalesced = 0
+    for category, name, args, _, _, _, seconds in PROFILER.spans:
+        if category == "phase":
+            phase_seconds, phase_count = phases.get(name, (0, 0))
+            phases[name] = (phase_seconds + seconds, phase_count + 1)
+        elif category == "fetch":
+            retries += args.get("retries", 0)
+            coalesced += args.get("coalesced", 0)
+            if args.get("coalesced"): continue
+            package_seconds, package_requests, package_bytes = packages.get(args["dependency"], (0, 0, 0))
+            packages[args["dependency"]] = (package_seconds + seconds, package_requests + 1, package_bytes + args.get("bytes", 0))
+        elif category == "cache":
+            cache_lookups += 1
+            cache_hits += args["hit"]
+
+    phase_table = Table(title="phases")
+    for column in ["phase", "seconds", "count"]: phase_table.add_column(column, justify="left" if column == "phase" else "right")
+    for name, (seconds, count) in phases.items():
+        phase_table.add_row(name, f"{seconds:.3f}", str(count))
+    console.print(phase_table)
+
+    package_table = Table(title=f"slowest packages ({len(packages)} fetched)")
+    for column in ["package", "seconds", "requests", "kilobytes"]: package_table.add_column(column, justify="left" if column == "package" else "right")
+    for dependency, (seconds, requests, size) in sorted(packages.items(), key=lambda item: -item[1][0])[:top]:
+        package_table.add_row(dependency, f"{seconds:.3f}", str(requests), f"{size / 1024:.1f}")
+    console.print(package_table)
+    console.print(f"cache hit ratio: {cache_hits}/{cache_lookups} ({cache_hits / (cache_lookups or 1):.0%})")
+    console.print(f"registry retries: {retries}, coalesced requests: {coalesced}")
+
+
+
+
+
+
 # region -
 # region FILE I/O
 
@@ -83,89 +354,185 @@ def backup_package(package_directory: pathlib.PosixPath):
 
 
 # region -
+# region . read_package_json
+def read_package_json(package_directory: pathlib.PosixPath):
+    package_text = (package_directory / "package.json").read_text(encoding="utf-8")
+    indent_match = re.search(r"\n([ \t]+)\S", package_text)
+    package_json_format = {"indent": indent_match.group(1) if indent_match else 4, "trailing_newline": package_text.endswith("\n")}
+    return json.loads(package_text), package_json_format
+
+# region . write_json_atomic
+def write_json_atomic(path: pathlib.PosixPath, data, indent=4, trailing_newline=False):
+    temporary_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, indent=indent, ensure_ascii=False)
+            if trailing_newline: file.write("\n")
+        if path.exists(): shutil.copymode(path, temporary_path)
+        os.replace(temporary_path, path)
+    finally:
+        temporary_path.unlink(missing_ok=True)
+
+# region . get_dependency_maps
+def get_dependency_maps(package_json):
+    # dependencies, devDependencies, peerDependencies, ... but not peerDependenciesMeta or bundleDependencies lists
+    return {key: value for key, value in package_json.items() if "dependencies" in key.lower() and type(value) is dict and not key.endswith("Meta")}
+
 # region . get_dependencies_list
-def get_dependencies_list(package_directory: pathlib.PosixPath):
-    with open(package_directory / "package.json", "r") as file:
-        package = json.load(file)
-        dependencies_list = []
-        for key, value in package.items():
-            if "dependencies" in key.lower():
-                dependencies_list.extend(list(value))
-        return dependencies_list
+def get_dependencies_list(package_json):
+    dependencies_list = []
+    for value in get_dependency_maps(package_json).values():
+        dependencies_list.extend(list(value))
+    return dependencies_list
 
 # region . get_latest_version_restrictions
-def get_latest_version_restrictions(package_directory: pathlib.PosixPath):
-    with open(package_directory / "package.json", "r") as file:
-        package = json.load(file)
-        return package.get("latestVersionRestrictions", {})
+def get_latest_version_restrictions(package_json):
+    return package_json.get("latestVersionRestrictions", {})
+
+# region . read_local_packages
+def read_local_packages(package_directory: pathlib.PosixPath, latest_version_restrictions):
+    local_packages = {}
+    lockfile_path = package_directory / "package-lock.json"
+    if lockfile_path.exists():
+        with open(lockfile_path, "r") as file:
+            lockfile = json.load(file)
+        for path, manifest in lockfile.get("packages", {}).items():
+            if "node_modules/" not in path or "version" not in manifest: continue
+            dependency = manifest.get("name", path.rsplit("node_modules/", 1)[1])
+            local_packages.setdefault(dependency, {})[manifest["version"]] = {field: manifest[field] for field in PACKUMENT_VERSION_FIELDS if field in manifest}
+    node_modules_directory = package_directory / "node_modules"
+    for manifest_path in [*node_modules_directory.glob("*/package.json"), *node_modules_directory.glob("@*/*/package.json")]:
+        try:
+            with open(manifest_path, "r") as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            continue
+        if "name" not in manifest or "version" not in manifest: continue
+        local_packages.setdefault(manifest["name"], {})[manifest["version"]] = {field: manifest[field] for field in PACKUMENT_VERSION_FIELDS if field in manifest}
+    # a restricted version that is not installed still has to come from the registry
+    return {
+        dependency: versions for dependency, versions in local_packages.items()
+        if dependency not in latest_version_restrictions or latest_version_restrictions[dependency] in versions
+    }
 
 # region . write_package_versions
 def write_package_versions(package_directory: pathlib.PosixPath, package):
-    with open(package_directory / "package-versions.json", "w") as file:
-        package_versions = {}
-        for dependency, dependency_info in package.items():
-            package_versions[dependency] = dependency_info["version"]
-        json.dump(package_versions, file, indent=4)
+    package_versions = {}
+    for dependency, node in package.items():
+        package_versions[dependency] = node.version
+    write_json_atomic(package_directory / "package-versions.json", package_versions)
 
 # region . write_package_peerDependencies
 def write_package_peerDependencies(package_directory: pathlib.PosixPath, package):
-    with open(package_directory / "package-peerDependencies.json", "w") as file:
-        package_peerDependencies = {}
-        for dependency, dependency_info in package.items():
-            package_peerDependencies[dependency] = {}
-            for key, value in dependency_info.items():
-                if key != "versions":
-                    package_peerDependencies[dependency][key] = value
-        json.dump(package_peerDependencies, file, indent=4)
+    package_peerDependencies = {}
+    for dependency, node in package.items():
+        package_peerDependencies[dependency] = node.to_json()
+    write_json_atomic(package_directory / "package-peerDependencies.json", package_peerDependencies)
+
+# region . write_package_snapshot
+def write_package_snapshot(package_directory: pathlib.PosixPath, dependencies, latest_version_restrictions, resolved):
+    write_json_atomic(package_directory / PACKAGE_SNAPSHOT_FILE, {
+        "dependencies": dependencies,
+        "latestVersionRestrictions": latest_version_restrictions,
+        "lockfile": SETTINGS["lockfile"],
+        "resolved": resolved,
+    })
+
+# region . get_package_diff
+def get_package_diff(package_json, package):
+    package_diff = {"added": {}, "upgraded": {}, "downgraded": {}, "pinned": {}, "changed": {}, "stale": {}}
+    requested_versions = {}
+    for value in get_dependency_maps(package_json).values(): requested_versions.update(value)
+    for dependency, node in package.items():
+        if node.stale:
+            package_diff["stale"][dependency] = datetime.fromtimestamp(node.last_publish, timezone.utc).strftime("%Y-%m-%d") if node.last_publish else None
+        if dependency not in requested_versions:
+            package_diff["added"][dependency] = node.version
+            continue
+        requested_version = requested_versions[dependency]
+        if requested_version == node.version: continue
+        if not is_valid_range(requested_version) or not SEMVER_VERSION_PATTERN.fullmatch(node.version):
+            package_diff["changed"][dependency] = {"from": requested_version, "to": node.version}
+            continue
+        # a version the range already allows is only pinned; otherwise it lies above or below the whole range
+        compatible, greater_than = check_version_compatibility(node.version, requested_version)
+        package_diff["pinned" if compatible else "upgraded" if greater_than else "downgraded"][dependency] = {"from": requested_version, "to": node.version}
+    return package_diff
+
+# region . write_package_diff
+def write_package_diff(package_directory: pathlib.PosixPath, package_diff):
+    write_json_atomic(package_directory / PACKAGE_DIFF_FILE, package_diff, indent=None)
+
+# region . read_package_snapshot
+def read_package_snapshot(package_directory: pathlib.PosixPath):
+    snapshot_path = package_directory / PACKAGE_SNAPSHOT_FILE
+    package_peerDependencies_path = package_directory / "package-peerDependencies.json"
+    if not snapshot_path.exists() or not package_peerDependencies_path.exists(): return None, None
+    with open(snapshot_path, "r") as file:
+        snapshot = json.load(file)
+    with open(package_peerDependencies_path, "r") as file:
+        package_peerDependencies = json.load(file)
+    return snapshot, package_peerDependencies
 
 # region . print_added_peerDependencies
-def print_added_peerDependencies(package_directory: pathlib.PosixPath, package):
+def print_added_peerDependencies(dependencies, package):
     added_peerDependencies = []
-    dependencies = get_dependencies_list(package_directory)
     for dependency in package:
         if dependency in dependencies: continue
         added_peerDependencies.append(dependency)
     console.print(f"\nadded peerDependencies: {added_peerDependencies}")
 
+# region . print_unresolved_conflicts
+def print_unresolved_conflicts(package_problems):
+    console.print(f"\n[red]unresolved peerDependency conflicts:[/red]")
+    for dependency, dependency_version, problems in package_problems:
+        for peer, dependency_requirements in {**problems["greater_than"], **problems["else"]}.items():
+            console.print(f"-- {peer} requires {dependency}@{dependency_requirements}, found {dependency}@{dependency_version}")
+
 # region . print_stale_dependencies
 def print_stale_dependencies(package):
     stale_dependencies = []
-    for dependency, dependency_info in package.items():
-        if dependency_info["stale"]:
+    for dependency, node in package.items():
+        if node.stale:
             stale_dependencies.append(dependency)
     console.print(f"\nstale dependencies found: {stale_dependencies}")
+    for dependency in stale_dependencies:
+        last_publish = package[dependency].last_publish
+        if not last_publish: continue
+        console.print(f"-- {dependency}: last published {datetime.fromtimestamp(last_publish, timezone.utc):%Y-%m-%d} ({(time.time() - last_publish) / (24 * 3600):.0f} days ago)")
+
+# region . write_package
+def write_package(package_directory: pathlib.PosixPath, package, package_json, package_json_format):
+    package_path = pathlib.Path(package_directory / "package.json")
+    updated_dependencies = set()
+    for value in get_dependency_maps(package_json).values():
+        for dependency, node in package.items():
+            if dependency in value:
+                value[dependency] = node.version
+                updated_dependencies.add(dependency)
+    for dependency, node in package.items():
+        if dependency in updated_dependencies: continue
+        package_json.setdefault("dependencies", {})[dependency] = node.version
+    write_json_atomic(package_path, package_json, **package_json_format)
+    console.print(f"[bold green]{package_path} has been updated with the resolved versions.[/bold green]")
 
 # region . overwrite_package
-def overwrite_package(package_directory: pathlib.PosixPath):
+def overwrite_package(package_directory: pathlib.PosixPath, package, package_json, package_json_format):
+    from InquirerPy import inquirer
+    package_path = pathlib.Path(package_directory / "package.json")
     overwrite = inquirer.confirm(
         message=f"Do you want to overwrite and update versions to {package_path}?",
         default=False,
     ).execute()
     if overwrite:
-        package_path = pathlib.Path(package_directory / "package.json")
-        with open(package_directory / "package-versions.json", "r") as file:
-            package_versions = json.load(file)
-        with open(package_path, "r") as file:
-            package_json = json.load(file)
-        updated_dependencies = []
-        for key in package_json:
-            if "dependencies" not in key.lower(): continue
-            for dependency, version in package_versions.items():
-                if dependency in package_json[key]:
-                    package_json[key][dependency] = version
-                    updated_dependencies.append(dependency)
-        for dependency, version in package_versions.items():
-            if dependency in updated_dependencies: continue
-            package_json["dependencies"][dependency] = version
-        with open(package_path, "w") as file:
-            json.dump(package_json, file, indent=4)
-        console.print(f"[bold green]{package_path} has been updated with versions from package-versions.json.[/bold green]")
+        write_package(package_directory, package, package_json, package_json_format)
         cleanup_temp_files(package_directory)
     else:
         console.print(f"Package update was not performed for {package_path}.")
 
 # region . cleanup_temp_files
 def cleanup_temp_files(package_directory: pathlib.PosixPath):
+    from InquirerPy import inquirer
     remove_files = inquirer.confirm(
         message="Remove temporary files?",
         default=False,
@@ -191,47 +558,465 @@ def cleanup_temp_files(package_directory: pathlib.PosixPath):
 # region -
 # region . json_npm_shell
 def json_npm_shell(command, dependency, field, default="{}"):
-    output = subprocess.run(f"npm {command} {dependency} {field} --json", shell=True, capture_output=True, text=True).stdout.strip()
-    return json.loads(output or default)
+    process = subprocess.run(f"npm {command} {dependency} {field} --json", shell=True, capture_output=True, text=True)
+    output = process.stdout.strip()
+    PROFILER.add(bytes=len(output))
+    if process.returncode != 0:
+        # npm reports registry errors as E<status>; only client errors other than 429 are final
+        error_code = re.search(r"\bE(\d{3})\b", process.stderr + output)
+        error_class = RegistryError if error_code and error_code.group(1).startswith("4") and error_code.group(1) != "429" else TransientRegistryError
+        raise error_class(f"npm {command} {dependency} {field} failed with exit code {process.returncode}: {(process.stderr.strip().splitlines() or [""])[0]}")
+    try:
+        return json.loads(output or default)
+    except json.JSONDecodeError as error:
+        raise TransientRegistryError(f"npm {command} {dependency} {field} returned invalid JSON") from error
+
+# region . RegistryError
+class RegistryError(Exception):
+    pass
+
+# region . TransientRegistryError
+class TransientRegistryError(RegistryError):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+# region . PackageTimeout
+class PackageTimeout(BaseException):
+    # not an Exception, so retry and fallback handlers (a socket timeout is an OSError) cannot swallow batch --timeout
+    pass
+
+# region . read_npmrc
+@functools.cache
+def read_npmrc():
+    config = {}
+    for npmrc_path in [pathlib.Path.home() / ".npmrc", get_project_root() / ".npmrc"]:
+        if not npmrc_path.exists(): continue
+        for line in npmrc_path.read_text().splitlines():
+            line = line.strip()
+            if not line or line[0] in "#;" or "=" not in line: continue
+            key, value = (part.strip() for part in line.split("=", 1))
+            config[key] = re.sub(r"\$\{([^}]+)\}", lambda match: os.environ.get(match.group(1), ""), value).strip("\"'")
+    for key, value in os.environ.items():
+        if key.lower() == "npm_config_registry": config["registry"] = value
+    return config
+
+# region . get_registry
+def get_registry(dependency):
+    config = read_npmrc()
+    scope = dependency.split("/")[0] if dependency.startswith("@") else None
+    registry = config.get(f"{scope}:registry") or config.get("registry") or "https://registry.npmjs.org/"
+    return registry.rstrip("/") + "/"
+
+# region . get_registry_headers
+def get_registry_headers(registry):
+    config = read_npmrc()
+    nerf_dart = re.sub(r"^https?:", "", registry)
+    credentials = {}
+    for key, value in config.items():
+        prefix, _, field = key.rpartition(":")
+        if prefix.startswith("//") and nerf_dart.startswith(prefix.rstrip("/") + "/"):
+            credentials.setdefault(len(prefix), {})[field] = value
+    if not credentials: return {}
+    credentials = credentials[max(credentials)]
+    if "_authToken" in credentials: return {"Authorization": f"Bearer {credentials["_authToken"]}"}
+    if "_auth" in credentials: return {"Authorization": f"Basic {credentials["_auth"]}"}
+    if "username" in credentials and "_password" in credentials:
+        password = base64.b64decode(credentials["_password"]).decode()
+        return {"Authorization": f"Basic {base64.b64encode(f"{credentials["username"]}:{password}".encode()).decode()}"}
+    return {}
+
+# region . HttpRegistryBackend
+class HttpRegistryBackend:
+    fetches_whole_packument = True
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def get_connection(self, scheme, netloc):
+        import http.client
+        pool = self.local.__dict__.setdefault("pool", {})
+        if (scheme, netloc) not in pool:
+            connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            pool[scheme, netloc] = connection_class(netloc, timeout=60)
+        return pool[scheme, netloc]
+
+    def get_json(self, url, headers):
+        import http.client
+        parsed_url = urllib.parse.urlsplit(url)
+        path = parsed_url.path + (f"?{parsed_url.query}" if parsed_url.query else "")
+        for attempt in range(2):
+            connection = self.get_connection(parsed_url.scheme, parsed_url.netloc)
+            try:
+                connection.request("GET", path, headers={"Accept-Encoding": "gzip", **headers})
+                response = connection.getresponse()
+                body = response.read()
+                break
+            except (http.client.HTTPException, OSError) as error:
+                # a pooled connection may have been closed by the server, so reconnect once right away
+                connection.close()
+                self.local.pool.pop((parsed_url.scheme, parsed_url.netloc))
+                if attempt == 1: raise TransientRegistryError(f"{url}: {error}") from error
+        if response.status == 429 or response.status >= 500:
+            retry_after = response.getheader("Retry-After")
+            raise TransientRegistryError(f"{url}: HTTP {response.status}", retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None)
+        if response.status != 200: raise RegistryError(f"{url}: HTTP {response.status}")
+        PROFILER.add(bytes=len(body))
+        try:
+            if response.getheader("Content-Encoding") == "gzip": body = gzip.decompress(body)
+            return json.loads(body)
+        except (EOFError, OSError, ValueError, zlib.error) as error:
+            # e.g. a truncated body or a proxy answering with an HTML page
+            raise TransientRegistryError(f"{url}: invalid JSON response") from error
+
+    def fetch_packument(self, dependency, full=False):
+        registry = get_registry(dependency)
+        accept = "application/json" if full else "application/vnd.npm.install-v1+json; q=1.0, application/json; q=0.8"
+        packument = self.get_json(
+            registry + urllib.parse.quote(dependency, safe="@"),
+            headers={"Accept": accept, **get_registry_headers(registry)},
+        )
+        manifests = {}
+        for version, manifest in packument.get("versions", {}).items():
+            manifests[version] = {field: manifest[field] for field in PACKUMENT_VERSION_FIELDS if field in manifest}
+        return {
+            "versions": list(manifests),
+            "dist-tags": packument.get("dist-tags", {}),
+            **({"time": packument["time"]} if "time" in packument else {}),
+            "manifests": manifests,
+        }
+
+    def fetch_manifest(self, dependency, version):
+        return self.fetch_packument(dependency)
+
+# region . NpmCliBackend
+class NpmCliBackend:
+    fetches_whole_packument = False
+
+    def fetch_packument(self, dependency, full=False):
+        fields = "versions dist-tags time" if full else "versions dist-tags"
+        packument = json_npm_shell("view", dependency, fields)
+        if "versions" not in packument: raise RegistryError(f"npm view {dependency} returned no versions")
+        if type(packument["versions"]) is str: packument["versions"] = [packument["versions"]]
+        return packument
+
+    def fetch_manifest(self, dependency, version):
+        manifest = {}
+        for field in PACKUMENT_VERSION_FIELDS:
+            value = json_npm_shell("info", f"{dependency}@{version}", field)
+            if value: manifest[field] = value
+        return {"manifests": {version: manifest}}
+
+METADATA_BACKENDS = {"http": HttpRegistryBackend, "npm": NpmCliBackend}
+
+# region . get_metadata_backends
+@functools.cache
+def get_metadata_backends():
+    backends = list(METADATA_BACKENDS) if SETTINGS["backend"] == "auto" else [SETTINGS["backend"]]
+    return [METADATA_BACKENDS[backend]() for backend in backends]
+
+# region . RequestScheduler
+class RequestScheduler:
+    def __init__(self, requests_per_second=0, concurrency=8, retries=3):
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.semaphore = threading.BoundedSemaphore(concurrency)
+        self.requests_per_second = requests_per_second
+        self.tokens, self.refilled_at = max(requests_per_second, 1), time.monotonic()
+        self.retries = retries
+        self.random = random.Random()
+
+    def wait_for_token(self):
+        if not self.requests_per_second: return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(max(self.requests_per_second, 1), self.tokens + (now - self.refilled_at) * self.requests_per_second)
+                self.refilled_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.requests_per_second
+            time.sleep(delay)
+
+    def call(self, key, request):
+        from concurrent.futures import Future
+        with self.lock:
+            future = self.inflight.get(key)
+            is_leader = future is None
+            if is_leader: future = self.inflight[key] = Future()
+        if not is_leader:
+            PROFILER.add(coalesced=1)
+            return future.result()
+        # the future is dropped once settled, so a failure is never handed to later callers
+        try:
+            result = self.call_with_retries(request)
+            future.set_result(result)
+            return result
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        finally:
+            with self.lock: del self.inflight[key]
+
+    def call_with_retries(self, request):
+        for attempt in range(self.retries + 1):
+            with self.semaphore:
+                self.wait_for_token()
+                try:
+                    return request()
+                except TransientRegistryError as error:
+                    if attempt == self.retries: raise
+                    retry_after = error.retry_after
+            # exponential backoff with full jitter, so parallel retries do not hit the registry in lockstep
+            delay = self.random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+            PROFILER.add(retries=1)
+            time.sleep(max(delay, min(retry_after or 0, RETRY_MAX_DELAY)))
+
+# region . get_request_scheduler
+@functools.cache
+def get_request_scheduler():
+    return RequestScheduler(SETTINGS["requests_per_second"], concurrency=SETTINGS["concurrency"], retries=SETTINGS["retries"])
+
+# region . fetch_metadata
+def fetch_metadata(method, *args, **kwargs):
+    if SETTINGS["offline"]: raise RegistryError(f"{args[0]} is not in the npm cache or lockfile and --offline is set")
+    for backend in get_metadata_backends():
+        try:
+            with PROFILER.span("fetch", method, dependency=args[0], backend=type(backend).__name__):
+                return get_request_scheduler().call(
+                    (type(backend).__name__, method, args, tuple(sorted(kwargs.items()))),
+                    lambda: getattr(backend, method)(*args, **kwargs),
+                )
+        except RegistryError as error:
+            registry_error = error
+    raise registry_error
+
+# region . NpmCacheStore
+class NpmCacheStore:
+    def __init__(self, cache_path: pathlib.PosixPath, max_bytes, refreshed_before=0):
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(cache_path, timeout=60, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.lock = threading.RLock()
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY, value TEXT NOT NULL,
+                fetched_at REAL NOT NULL, accessed_at REAL NOT NULL, size INTEGER NOT NULL
+            )
+        """)
+        self.index = {key: (fetched_at, size) for key, fetched_at, size in self.connection.execute("SELECT key, fetched_at, size FROM entries")}
+        self.max_bytes = max_bytes
+        self.refreshed_before = refreshed_before
+        self.entries, self.pending, self.accessed = {}, {}, {}
+        atexit.register(self.flush)
+
+    def get(self, key, ttl=None, default=None):
+        with self.lock:
+            if key not in self.index: return default
+            fetched_at, _ = self.index[key]
+            if ttl is not None and (fetched_at < self.refreshed_before or time.time() - fetched_at > ttl): return default
+            if key not in self.entries:
+                row = self.connection.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    # another process sharing the cache has evicted the entry since the index was loaded
+                    self.index.pop(key, None)
+                    return default
+                self.entries[key] = json.loads(row[0])
+            self.accessed[key] = time.time()
+            return self.entries[key]
+
+    def reload(self, key, ttl=None):
+        with self.lock:
+            row = self.connection.execute("SELECT value, fetched_at, size FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or key in self.pending: return self.get(key, ttl=ttl)
+            value, fetched_at, size = row
+            self.index[key] = (fetched_at, size)
+            self.entries[key] = json.loads(value)
+            return self.get(key, ttl=ttl)
+
+    def set(self, key, value, fetched_at=None):
+        now = time.time()
+        fetched_at = fetched_at or now
+        value_json = json.dumps(value, separators=(",", ":"))
+        with self.lock:
+            self.entries[key] = value
+            self.index[key] = (fetched_at, len(value_json))
+            self.pending[key] = (key, value_json, fetched_at, now, len(value_json))
+            if len(self.pending) >= NPM_CACHE_BATCH_SIZE: self.flush()
+
+    def flush(self):
+        with self.lock:
+            self.connection.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", [
+                (key, value_json, fetched_at, self.accessed.get(key, accessed_at), size)
+                for key, value_json, fetched_at, accessed_at, size in self.pending.values()
+            ])
+            self.connection.executemany("UPDATE entries SET accessed_at = ? WHERE key = ?", [
+                (accessed_at, key) for key, accessed_at in self.accessed.items() if key not in self.pending
+            ])
+            self.pending, self.accessed = {}, {}
+            self.evict()
+            self.connection.commit()
+
+    def evict(self):
+        total_bytes = sum(size for _, size in self.index.values())
+        if total_bytes <= self.max_bytes: return
+        evicted_keys = []
+        for key, size in self.connection.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall():
+            if total_bytes <= self.max_bytes * 0.9: break
+            evicted_keys.append((key,))
+            total_bytes -= size
+            self.index.pop(key, None)
+            self.entries.pop(key, None)
+        self.connection.executemany("DELETE FROM entries WHERE key = ?", evicted_keys)
+
+# region . get_npm_cache_store
+@functools.cache
+def get_npm_cache_store():
+    return NpmCacheStore(
+        SETTINGS["cache_directory"] / NPM_CACHE_FILE,
+        max_bytes=SETTINGS["cache_max_megabytes"] * 1024 * 1024,
+        refreshed_before=SETTINGS["refreshed_before"],
+    )
+
+# region . inflight_lock
+@contextlib.contextmanager
+def inflight_lock(inflight_key):
+    if SETTINGS["inflight_directory"] is None:
+        yield
+        return
+    lock_path = SETTINGS["inflight_directory"] / hashlib.sha1(inflight_key.encode()).hexdigest()
+    with open(lock_path, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
 
 # region . npm_cache
-def npm_cache(package_directory: pathlib.PosixPath, command, dependency, field, default="{}"):
-    NPM_CACHE_FILE = ".npm_cache.json"
-    full_command = f"{command} {dependency} {field}"
-    cache, data = {}, None
-    if (package_directory / NPM_CACHE_FILE).exists():
-        with open(package_directory / NPM_CACHE_FILE, "r") as file:
-            cache = json.load(file)
-        if full_command in cache: return cache[full_command]
-    data = json_npm_shell(command, dependency, field, default=default)
-    cache[full_command] = data
-    with open(package_directory / NPM_CACHE_FILE, "w") as file:
-        json.dump(cache, file, indent=4)
-    return data
+def npm_cache(key, fetch, ttl=None, inflight_key=None):
+    cache = get_npm_cache_store()
+    if SETTINGS["offline"]: ttl = None
+    start = time.perf_counter()
+    data = cache.get(key, ttl=ttl)
+    if data is not None:
+        PROFILER.record("cache", key, start, hit=True)
+        return data
+    with PROFILER.span("cache", key, hit=False) as span:
+        if SETTINGS["inflight_directory"] is None: return fetch()
+        # another worker process may be fetching the same package; wait for it and reuse its result
+        with inflight_lock(inflight_key or key):
+            data = cache.reload(key, ttl=ttl)
+            if data is not None:
+                span["hit"] = True
+                return data
+            data = fetch()
+            cache.flush()
+        return data
+
+# region . cache_packument
+def cache_packument(dependency, packument, fetched_at=None):
+    cache = get_npm_cache_store()
+    # only the newest publish time is kept; the full time map can hold thousands of entries
+    if "time" in packument: packument = {**packument, "last-publish": get_last_publish_timestamp(packument["time"])}
+    for field in VOLATILE_FIELDS:
+        if field in packument: cache.set(f"{field} {dependency}", packument[field], fetched_at)
+    for version, manifest in packument.get("manifests", {}).items():
+        if f"manifest {dependency}@{version}" in cache.index: continue
+        cache.set(f"manifest {dependency}@{version}", manifest, fetched_at)
+    return packument
+
+# region . import_legacy_npm_cache
+def import_legacy_npm_cache(package_directory: pathlib.PosixPath):
+    legacy_cache_path = package_directory / LEGACY_NPM_CACHE_FILE
+    if not legacy_cache_path.exists(): return
+    cache = get_npm_cache_store()
+    fetched_at = legacy_cache_path.stat().st_mtime
+    if cache.get(f"legacy {legacy_cache_path}") == fetched_at: return
+    with open(legacy_cache_path, "r") as file:
+        legacy_cache = json.load(file)
+    manifests = {}
+    for key, value in legacy_cache.items():
+        _, dependency, field = (key.split(" ") + ["", ""])[:3]
+        if field == "time":
+            cache.set(f"last-publish {dependency}", get_last_publish_timestamp(value), fetched_at)
+        elif field in VOLATILE_FIELDS:
+            cache.set(f"{field} {dependency}", [value] if field == "versions" and type(value) is str else value, fetched_at)
+        elif field in PACKUMENT_VERSION_FIELDS:
+            manifests.setdefault(dependency, {})[field] = value
+    for dependency_at_version, manifest in manifests.items():
+        if len(manifest) < len(PACKUMENT_VERSION_FIELDS): continue
+        cache.set(f"manifest {dependency_at_version}", {field: value for field, value in manifest.items() if value}, fetched_at)
+    cache.set(f"legacy {legacy_cache_path}", fetched_at)
+    console.print(f"imported legacy npm cache: {legacy_cache_path}")
+
+# region . get_local_packument_field
+def get_local_packument_field(dependency, field):
+    # installed dependencies take the registry's answer from the npm cache however old it is, so only one the cache has
+    # never seen costs a request; that one full packument brings its versions, dist-tags and publish time together
+    if SETTINGS["offline"]: registry_value = get_npm_cache_store().get(f"{field} {dependency}")
+    else: registry_value = get_registry_packument_field(dependency, field, ttl=float("inf"), full=True)
+    if field == "last-publish": return registry_value or 0
+    local_versions = sorted(LOCAL_PACKAGES[dependency], key=parse_version, reverse=True)
+    if field == "dist-tags": return registry_value or {"latest": local_versions[0]}
+    return list(dict.fromkeys([*local_versions, *(registry_value or [])]))
+
+# region . get_packument_field
+def get_packument_field(dependency, field):
+    if dependency in LOCAL_PACKAGES: return get_local_packument_field(dependency, field)
+    if SETTINGS["offline"] and field == "last-publish": return get_npm_cache_store().get(f"last-publish {dependency}") or 0
+    return get_registry_packument_field(dependency, field)
+
+# region . get_registry_packument_field
+def get_registry_packument_field(dependency, field, ttl=None, full=False):
+    full = full or field == "last-publish"
+
+    def _fetch():
+        packument = fetch_metadata("fetch_packument", dependency, full=full)
+        # a registry that sends no time map leaves the publish time unknown, which is cached as 0 like offline
+        if full and "time" not in packument: packument = {**packument, "last-publish": 0}
+        return cache_packument(dependency, packument)[field]
+
+    return npm_cache(
+        f"{field} {dependency}",
+        _fetch,
+        ttl=SETTINGS["ttl"][field] if ttl is None else ttl,
+        inflight_key=dependency,
+    )
+
+# region . get_manifest
+def get_manifest(dependency, version):
+    if version in LOCAL_PACKAGES.get(dependency, {}): return LOCAL_PACKAGES[dependency][version]
+    return npm_cache(
+        f"manifest {dependency}@{version}",
+        lambda: cache_packument(dependency, fetch_metadata("fetch_manifest", dependency, version))["manifests"].get(version, {}),
+        inflight_key=dependency,
+    )
 
 # region . get_versions
-def get_versions(package_directory: pathlib.PosixPath, dependency):
-    console.print(f"{dependency}: versions", end=" ")
-    versions_output = npm_cache(package_directory, "info", dependency, "versions", "[]")
+def get_versions(dependency, mute=False):
+    if mute == False: console.print(f"{dependency}: versions", end=" ")
+    versions_output = get_packument_field(dependency, "versions")
     pattern = r"\d+\.\d+\.\d+(?:-0)?"
     filtered_versions = list(set([version for version in versions_output if re.fullmatch(pattern, version)]))
-    versions = sorted(filtered_versions, key=parse, reverse=True)
-    console.print(f"({len(versions)})", end=" ")
+    versions = sorted(filtered_versions, key=parse_version, reverse=True)
+    if mute == False: console.print(f"({len(versions)})", end=" ")
     return versions
 
 # region . get_latest_version
-def get_latest_version(package_directory: pathlib.PosixPath, dependency):
-    console.print(f"latest version", end=" ")
-    dist_tags_output = npm_cache(package_directory, "view", dependency, "dist-tags")
+def get_latest_version(dependency, mute=False):
+    if mute == False: console.print(f"latest version", end=" ")
+    dist_tags_output = get_packument_field(dependency, "dist-tags")
     latest_version = dist_tags_output["latest"]
-    console.print(f"({latest_version})", end=" ")
+    if mute == False: console.print(f"({latest_version})", end=" ")
     return latest_version
 
 # region . get_peerDependencies
-def get_peerDependencies(package_directory: pathlib.PosixPath, dependency, version, mute=False):
+def get_peerDependencies(dependency, version, mute=False):
     if mute == False: console.print(f"peerDependencies", end=" ")
-    peerDependencies_output = npm_cache(package_directory, "info", f"{dependency}@{version}", "peerDependencies")
-    peerDependenciesMeta_output = npm_cache(package_directory, "info", f"{dependency}@{version}", "peerDependenciesMeta")
+    manifest = get_manifest(dependency, version)
+    peerDependencies_output = manifest.get("peerDependencies", {})
+    peerDependenciesMeta_output = manifest.get("peerDependenciesMeta", {})
     peerDependencies = {}
     for peer, semver_requirements in peerDependencies_output.items():
         if peerDependenciesMeta_output.get(peer, {}).get("optional", False): continue
@@ -239,15 +1024,15 @@ def get_peerDependencies(package_directory: pathlib.PosixPath, dependency, versi
     if mute == False: console.print(f"({len(peerDependencies)})")
     return peerDependencies
 
+# region . get_last_publish_timestamp
+def get_last_publish_timestamp(time_output):
+    timestamps = [timestamp for version, timestamp in time_output.items() if version != "modified"]
+    if not timestamps: return 0
+    return datetime.fromisoformat(max(timestamps).replace("Z", "+00:00")).timestamp()
+
 # region . is_dependency_stale
-def is_dependency_stale(package_directory: pathlib.PosixPath, dependency, years=1):
-    time_output = npm_cache(package_directory, "info", dependency, "time")
-    filtered_time = [(version, timestamp) for version, timestamp in time_output.items() if version != "modified"]
-    latest_timestamp = max(timestamp for _, timestamp in filtered_time).replace("Z", "+00:00")
-    then = datetime.fromisoformat(latest_timestamp)
-    now = datetime.now(timezone.utc)
-    is_stale = (now - then) > timedelta(days=365 * years)
-    return is_stale
+def is_dependency_stale(last_publish):
+    return bool(last_publish) and time.time() - last_publish > SETTINGS["stale_after_days"] * 24 * 3600
 
 
 
@@ -261,71 +1046,174 @@ def is_dependency_stale(package_directory: pathlib.PosixPath, dependency, years=
 
 
 # region -
-# region . range_intersection
-def range_intersection(range1, range2):
-    min1, max1 = range1
-    min2, max2 = range2
-    min_ = max(min1, min2)
-    max_ = max2 if max1 == "inf" else max1 if max2 == "inf" else min(max1, max2)
-    if max_ != "inf" and min_ >= max_: return None
-    return min_, max_
+# region . parse_version
+@functools.cache
+def parse_version(version):
+    match = SEMVER_VERSION_PATTERN.fullmatch(version.strip())
+    if match is None: raise ValueError(f"invalid version: {version}")
+    major, minor, patch, prerelease = match.groups()
+    if prerelease is None: return int(major), int(minor), int(patch), 1, ()
+    identifiers = tuple((0, int(identifier), "") if identifier.isdigit() else (1, 0, identifier) for identifier in prerelease.split("."))
+    return int(major), int(minor), int(patch), 0, identifiers
+
+# region . compile_range
+@functools.cache
+def compile_range(semver_requirements):
+
+    def _partial(semver):
+        match = SEMVER_PARTIAL_PATTERN.fullmatch(semver)
+        if match is None: return None
+        major, minor, patch, prerelease = match.groups()
+        parts = [None if part is None or part in "xX*" else int(part) for part in (major, minor, patch)]
+        if parts[0] is None: parts[1] = None
+        if parts[1] is None: parts[2] = None
+        return parts, prerelease
+
+    def _key(parts, prerelease=None):
+        return parse_version(".".join(str(part or 0) for part in parts) + (f"-{prerelease}" if prerelease else ""))
+
+    def _next(parts, prerelease="0"):
+        major, minor, _ = parts
+        if minor is None: return _key([major + 1, 0, 0], prerelease)
+        return _key([major, minor + 1, 0], prerelease)
+
+    def _comparators(operator, semver):
+        partial = _partial(semver)
+        if partial is None: return None
+        parts, prerelease = partial
+        major, minor, patch = parts
+        if major is None:
+            if operator in ("<", ">"): return [(">=", MAX_VERSION_KEY)]
+            return []
+        exact = patch is not None
+        if operator in ("", "="):
+            if exact: return [(">=", _key(parts, prerelease)), ("<=", _key(parts, prerelease))]
+            return [(">=", _key(parts)), ("<", _next(parts))]
+        if operator == ">=": return [(">=", _key(parts, prerelease))]
+        if operator == "<": return [("<", _key(parts, prerelease or ("0" if not exact else None)))]
+        if operator == ">": return [(">", _key(parts, prerelease))] if exact else [(">=", _next(parts, prerelease=None))]
+        if operator == "<=": return [("<=", _key(parts, prerelease))] if exact else [("<", _next(parts))]
+        if operator == "~":
+            return [(">=", _key(parts, prerelease)), ("<", _next([major, minor, None]))]
+        if operator == "^":
+            if major > 0 or minor is None: upper = _key([major + 1, 0, 0], "0")
+            elif minor > 0 or patch is None: upper = _key([0, minor + 1, 0], "0")
+            else: upper = _key([0, 0, patch + 1], "0")
+            return [(">=", _key(parts, prerelease)), ("<", upper)]
+
+    def _hyphen(low, high):
+        low_partial, high_partial = _partial(low), _partial(high)
+        if low_partial is None or high_partial is None: return None
+        comparators = _comparators(">=", low) if low_partial[0][0] is not None else []
+        if high_partial[0][0] is None: return comparators
+        return comparators + _comparators("<=", high)
+
+    def _interval(comparators):
+        low, high, prerelease_cores = None, None, set()
+        for operator, key in comparators:
+            if key[3] == 0: prerelease_cores.add(key[:3])
+            if operator[0] == ">":
+                bound = (key, operator == ">=")
+                if low is None or (bound[0], not bound[1]) > (low[0], not low[1]): low = bound
+            else:
+                bound = (key, operator == "<=")
+                if high is None or (bound[0], bound[1]) < (high[0], high[1]): high = bound
+        return low, high, frozenset(prerelease_cores)
+
+    intervals = []
+    for semver_requirement in semver_requirements.split("||"):
+        semver_requirement = re.sub(r"(<=|>=|<|>|=|~>?|\^)\s+", r"\1", semver_requirement.strip())
+        hyphen = re.fullmatch(r"(\S+)\s+-\s+(\S+)", semver_requirement)
+        if hyphen:
+            comparators = _hyphen(*hyphen.groups())
+        else:
+            comparators = []
+            for semver in semver_requirement.split():
+                match = re.match(r"^(<=|>=|<|>|=|~>?|\^)?v?", semver)
+                operator = (match.group(1) or "").replace("~>", "~")
+                semver_comparators = _comparators(operator, semver[match.end():])
+                if semver_comparators is None:
+                    comparators = None
+                    break
+                comparators.extend(semver_comparators)
+        if comparators is None: comparators = []
+        intervals.append(_interval(comparators))
+    return tuple(intervals)
+
+# region . is_valid_range
+@functools.cache
+def is_valid_range(semver_requirements):
+    # compile_range matches any version for a range it cannot parse, e.g. "latest" or "workspace:*"
+    for semver_requirement in semver_requirements.split("||"):
+        semver_requirement = re.sub(r"(<=|>=|<|>|=|~>?|\^)\s+", r"\1", semver_requirement.strip())
+        hyphen = re.fullmatch(r"(\S+)\s+-\s+(\S+)", semver_requirement)
+        semvers = hyphen.groups() if hyphen else [re.sub(r"^(<=|>=|<|>|=|~>?|\^)?v?", "", semver) for semver in semver_requirement.split()]
+        if not all(SEMVER_PARTIAL_PATTERN.fullmatch(semver) for semver in semvers): return False
+    return True
+
+# region . is_version_in_interval
+def is_version_in_interval(version_key, interval):
+    low, high, prerelease_cores = interval
+    if low is not None and (version_key < low[0] or (version_key == low[0] and not low[1])): return False
+    if high is not None and (version_key > high[0] or (version_key == high[0] and not high[1])): return False
+    if version_key[3] == 0 and version_key[:3] not in prerelease_cores: return False
+    return True
 
 # region . check_version_compatibility
 def check_version_compatibility(semver_version, semver_requirements):
-
-    def _semver_to_tuple(semver):
-        if semver == "": return None
-        semver = re.sub(r"[-+].*$", "", semver).replace("*", "x")
-        match = re.match(r"^(\^|~|>=|<=|>|<|=)", semver)
-        symbol, version = (match.group(), semver[match.end():]) if match else ("=", semver)
-        parts = version.split(".")
-        parts += ["x"] * (3 - len(parts))
-        parts = [int(p) if p.isdigit() else None for p in parts]
-        return symbol, parts
-
-    def _get_range(semver):
-        def _semver_range(semver):
-            symbol, parts = _semver_to_tuple(semver) if type(semver) is str else semver
-            major, minor, patch = parts
-            if major is None: return [0, 0, 0], [None, None, None]
-            if symbol == "^":
-                if major > 0: return parts, [major + 1, 0, 0]
-                if minor > 0: return parts, [0, 1 + (minor or 0), 0]
-                return parts, [0, 0, patch + 1]
-            if symbol == "<": return [0, 0, 0], parts
-            if symbol == "~": return parts, [major, 1 + (minor or 0), 0]
-            if symbol == ">=": return parts, [None, None, None]
-            def _increment_version(parts):
-                major, minor, patch = parts
-                if patch is not None: return [major, minor, patch + 1]
-                if minor is not None: return [major, minor + 1, 0]
-                return [major + 1, 0, 0]
-            if symbol == "<=": return [0, 0, 0], _increment_version(parts)
-            if symbol == "=": return parts, _increment_version(parts)
-            if symbol == ">": return _increment_version(parts), [None, None, None]
-        min_, max_ = _semver_range(semver)
-        def _nones_to_zeros(parts): return [0 if p is None else p for p in parts]
-        def _nones_to_inf(parts): return "inf" if all(p is None for p in parts) else parts
-        return _nones_to_zeros(min_), _nones_to_inf(max_)
-
-    def _is_version_in_range(version_parts, range_):
-        min_, max_ = range_
-        if version_parts < min_: return False
-        if max_ != "inf" and version_parts >= max_: return False
-        return True
-
-    _, version_parts = _semver_to_tuple(semver_version)
+    version_key = parse_version(semver_version)
     greater_than = True
-    for semver_requirement in semver_requirements.split(" || "):
-        semver_tuples = [_semver_to_tuple(semver) for semver in (semver_requirement.strip() + " ").split(" ")[:2]]
-        ranges = [_get_range(semver_tuple) for semver_tuple in semver_tuples if semver_tuple is not None]
-        range_ = range_intersection(ranges[0], ranges[1]) if len(ranges) == 2 else ranges[0]
-        if _is_version_in_range(version_parts, range_): return True, None
-        if version_parts <= range_[0]: greater_than = False
+    for interval in compile_range(semver_requirements):
+        if is_version_in_interval(version_key, interval): return True, None
+        low = interval[0][0] if interval[0] is not None else MIN_VERSION_KEY
+        if version_key <= low: greater_than = False
     return False, greater_than
 
-
-
+# region . VersionIndex
+class VersionIndex:
+    __slots__ = ("versions", "keys", "descending")
+
+    def __init__(self, versions):
+        self.versions = sorted(set(versions), key=parse_version)
+        self.keys = [parse_version(version) for version in self.versions]
+        self.descending = tuple(reversed(self.versions))
+
+    def _bounds(self, interval, at_most_key=None):
+        low, high, _ = interval
+        start = 0 if low is None else (bisect.bisect_left if low[1] else bisect.bisect_right)(self.keys, low[0])
+        end = len(self.keys) if high is None else (bisect.bisect_right if high[1] else bisect.bisect_left)(self.keys, high[0])
+        if at_most_key is not None: end = min(end, bisect.bisect_right(self.keys, at_most_key))
+        return start, end
+
+    def highest(self, semver_requirements, at_most=None):
+        at_most_key = None if at_most is None else parse_version(at_most)
+        best = -1
+        for interval in compile_range(semver_requirements):
+            start, end = self._bounds(interval, at_most_key)
+            for position in range(end - 1, max(start, best + 1) - 1, -1):
+                if is_version_in_interval(self.keys[position], interval):
+                    best = position
+                    break
+        return self.versions[best] if best >= 0 else None
+
+    def matching(self, semver_requirements):
+        positions = set()
+        for interval in compile_range(semver_requirements):
+            start, end = self._bounds(interval)
+            positions.update(position for position in range(start, end) if is_version_in_interval(self.keys[position], interval))
+        return [self.versions[position] for position in sorted(positions, reverse=True)]
+
+    def at_most(self, version):
+        return self.versions[:bisect.bisect_right(self.keys, parse_version(version))][::-1]
+
+    def highest_at_most(self, version_key):
+        position = bisect.bisect_right(self.keys, version_key) - 1
+        return self.versions[position] if position >= 0 else None
+
+# region . get_version_index
+@functools.cache
+def get_version_index(dependency):
+    return VersionIndex(get_versions(dependency, mute=True))
 
 # region -
 # region PACKAGE UPDATE LOGIC
@@ -335,18 +1223,170 @@ def check_version_compatibility(semver_version, semver_requirements):
 
 
 # region -
+# region . PackageNode
+class PackageNode:
+    # versions is the per-dependency tuple shared through get_version_index;
+    # required_by is an insertion-ordered set so membership and removal are O(1)
+    __slots__ = ("versions", "version", "peerDependencies", "required_by", "stale", "last_publish")
+
+    def __init__(self, versions, version, peerDependencies, required_by, stale, last_publish=None):
+        self.versions = versions
+        self.version = version
+        self.peerDependencies = peerDependencies
+        self.required_by = dict.fromkeys(required_by)
+        self.stale = stale
+        self.last_publish = last_publish
+
+    def to_json(self):
+        return {"version": self.version, "peerDependencies": self.peerDependencies, "required_by": list(self.required_by), "stale": self.stale}
+
+    @classmethod
+    def from_json(cls, node_json, versions=None):
+        return cls(versions or (node_json["version"],), node_json["version"], node_json["peerDependencies"], node_json["required_by"], node_json["stale"])
+
+# region . get_restricted_version
+def get_restricted_version(versions, requested_version):
+    if requested_version in versions: return requested_version
+    return VersionIndex(versions).highest(f"<{requested_version}")
+
+# region . thread_pool
+@contextlib.contextmanager
+def thread_pool():
+    from concurrent.futures import ThreadPoolExecutor
+    executor = ThreadPoolExecutor(max_workers=SETTINGS["concurrency"])
+    try:
+        yield executor
+    finally:
+        # an interrupted prefetch (batch --timeout) drops its queued lookups instead of waiting for all of them
+        executor.shutdown(wait=False, cancel_futures=True)
+
+# region . prefetch_dependency_graph
+def prefetch_dependency_graph(dependencies, include_stale_dependencies=[], latest_version_restrictions={}):
+    def _prefetch_dependency(dependency):
+        if dependency not in include_stale_dependencies: get_packument_field(dependency, "last-publish")
+        versions = get_versions(dependency, mute=True)
+        if dependency in latest_version_restrictions:
+            latest_version = get_restricted_version(versions, latest_version_restrictions[dependency]) or versions[0]
+        else:
+            latest_version = get_latest_version(dependency, mute=True)
+        return get_peerDependencies(dependency, latest_version, mute=True)
+
+    get_npm_cache_store()
+    get_metadata_backends()
+    get_request_scheduler()
+    seen, frontier = set(), list(dependencies)
+    with thread_pool() as executor:
+        while frontier:
+            frontier = [dependency for dependency in dict.fromkeys(frontier) if dependency not in seen]
+            seen.update(frontier)
+            frontier = [peer for peerDependencies in executor.map(_prefetch_dependency, frontier) for peer in peerDependencies]
+    console.print(f"prefetched metadata for {len(seen)} dependencies")
+    return seen
+
+# region . prefetch_peerDependencies
+def prefetch_peerDependencies(candidate_versions):
+    cache = get_npm_cache_store()
+    fetches_whole_packument = get_metadata_backends()[0].fetches_whole_packument
+    get_request_scheduler()
+    tasks = []
+    for dependency, versions in candidate_versions.items():
+        missing_versions = [
+            version for version in versions
+            if f"manifest {dependency}@{version}" not in cache.index and version not in LOCAL_PACKAGES.get(dependency, {})
+        ]
+        if not missing_versions: continue
+        # one manifest miss pulls every manifest of the packument into the cache
+        if fetches_whole_packument: tasks.append((dependency, missing_versions[:1]))
+        else: tasks.extend((dependency, [version]) for version in missing_versions)
+    if not tasks: return
+    with thread_pool() as executor:
+        list(executor.map(lambda task: [get_peerDependencies(task[0], version, mute=True) for version in task[1]], tasks))
+
+# region . prefetch_conflict_peerDependencies
+def prefetch_conflict_peerDependencies(package, package_problems):
+    if get_metadata_backends()[0].fetches_whole_packument:
+        prefetch_peerDependencies({
+            involved_dependency: package[involved_dependency].versions
+            for dependency, _, problems in package_problems
+            for involved_dependency in [dependency, *problems["greater_than"], *problems["else"]]
+        })
+        return
+    # every manifest is its own request here, so only the versions probed by the peer downgrade search are fetched
+    get_request_scheduler()
+    searches = [
+        (peer, dependency, package[dependency].version, package[peer].versions)
+        for dependency, _, problems in package_problems
+        for peer in problems["else"]
+    ]
+    with thread_pool() as executor:
+        list(executor.map(lambda search: find_compatible_version(*search), searches))
+
+# region . reuse_previous_package
+def reuse_previous_package(package_directory: pathlib.PosixPath, dependencies, include_stale_dependencies=[], latest_version_restrictions={}):
+    snapshot, previous_package = read_package_snapshot(package_directory)
+    if snapshot is None or not snapshot["resolved"] or snapshot["lockfile"] != SETTINGS["lockfile"]: return None
+
+    previous_restrictions = snapshot["latestVersionRestrictions"]
+    restricted_dependencies = {
+        dependency for dependency in {*previous_restrictions, *latest_version_restrictions}
+        if previous_restrictions.get(dependency) != latest_version_restrictions.get(dependency)
+    }
+    added_dependencies = [dependency for dependency in dependencies if dependency not in snapshot["dependencies"]]
+    removed_dependencies = {dependency for dependency in snapshot["dependencies"] if dependency not in dependencies}
+    # crawl what changed on its own first, so any previous subgraph it reaches gets rebuilt too
+    changed_dependencies = added_dependencies + [dependency for dependency in restricted_dependencies if dependency in dependencies or dependency in previous_package]
+    touched_dependencies = restricted_dependencies | removed_dependencies
+    if changed_dependencies:
+        touched_dependencies |= prefetch_dependency_graph(
+            changed_dependencies,
+            include_stale_dependencies=include_stale_dependencies,
+            latest_version_restrictions=latest_version_restrictions)
+
+    neighbors = {dependency: set() for dependency in previous_package}
+    for dependency, dependency_info in previous_package.items():
+        for peer in dependency_info["peerDependencies"]:
+            if peer not in previous_package: continue
+            neighbors[dependency].add(peer)
+            neighbors[peer].add(dependency)
+    components = {}
+    for dependency in previous_package:
+        if dependency in components: continue
+        component, frontier = {dependency}, [dependency]
+        while frontier:
+            for neighbor in neighbors[frontier.pop()] - component:
+                component.add(neighbor)
+                frontier.append(neighbor)
+        for component_dependency in component: components[component_dependency] = component
+    kept_dependencies = {
+        dependency for dependency in previous_package
+        if not components[dependency] & touched_dependencies
+    }
+
+    # untouched subgraphs keep their resolved versions and are not re-solved
+    package = {}
+    for dependency in dependencies:
+        if dependency in kept_dependencies:
+            for kept_dependency in previous_package:
+                if kept_dependency in components[dependency] and kept_dependency not in package:
+                    package[kept_dependency] = PackageNode.from_json(previous_package[kept_dependency])
+        else:
+            package = add_recursive_dependency_to_package(
+                package, dependency, required_by="<root>",
+                include_stale_dependencies=include_stale_dependencies,
+                latest_version_restrictions=latest_version_restrictions)
+    console.print(f"reused {len(kept_dependencies & set(package))} resolved dependencies from package-peerDependencies.json")
+    return package
+
 # region . add_recursive_dependency_to_package
 def add_recursive_dependency_to_package(
-    package_directory,
     package, dependency, required_by="<root>",
     include_stale_dependencies=[],
     latest_version_restrictions={}
 ):
     if dependency in package:
-        if required_by not in package[dependency]["required_by"]:
-            package[dependency]["required_by"].append(required_by)
+        package[dependency].required_by[required_by] = None
     else:
-        versions = get_versions(package_directory, dependency)
+        versions = get_versions(dependency)
 
         if dependency in latest_version_restrictions:
             requested_version = latest_version_restrictions[dependency]
@@ -354,11 +1394,7 @@ def add_recursive_dependency_to_package(
                 latest_version = requested_version
                 console.print(f"restricted version ({requested_version})", end=" ")
             else:
-                fallback_version = None
-                for version in versions:
-                    if parse(version) < parse(requested_version):
-                        fallback_version = version
-                        break
+                fallback_version = get_restricted_version(versions, requested_version)
                 if fallback_version:
                     latest_version = fallback_version
                     console.print(f"restricted version {requested_version} not found, using fallback version ({fallback_version})", end=" ")
@@ -366,123 +1402,313 @@ def add_recursive_dependency_to_package(
                     latest_version = versions[0]
                     console.print(f"restricted version {requested_version} not found, using latest version ({latest_version})", end=" ")
         else:
-            latest_version = get_latest_version(package_directory, dependency)
-
-        peerDependencies = get_peerDependencies(package_directory, dependency, latest_version)
-        stale = False if dependency in include_stale_dependencies else is_dependency_stale(package_directory, dependency)
-        package[dependency] = {
-            "versions": versions,
-            "version": latest_version,
-            "peerDependencies": peerDependencies,
-            "required_by": [required_by],
-            "stale": stale,
-        }
+            latest_version = get_latest_version(dependency)
+
+        peerDependencies = get_peerDependencies(dependency, latest_version)
+        last_publish = None if dependency in include_stale_dependencies else get_packument_field(dependency, "last-publish")
+        package[dependency] = PackageNode(get_version_index(dependency).descending, latest_version, peerDependencies, [required_by], is_dependency_stale(last_publish), last_publish)
         for peer in peerDependencies:
             package = add_recursive_dependency_to_package(
-                package_directory,
                 package, peer, required_by=dependency,
                 include_stale_dependencies=include_stale_dependencies,
                 latest_version_restrictions=latest_version_restrictions
             )
     return package
 
-# region . check_package_problems
-def check_package_problems(package):
-    problems = {
-        "greater_than": {},
-        "else": {},
-    }
-    stop = False
-    for dependency, dependency_info in package.items():
-        if dependency_info["stale"]: continue
-        dependency_version = dependency_info["version"]
-        required_by = dependency_info["required_by"]
-        for peer in required_by:
-            if peer == "<root>": continue
-            if package[peer]["stale"]: continue
-            dependency_requirements = package[peer]["peerDependencies"][dependency]
-            compatible, greater_than = check_version_compatibility(dependency_version, dependency_requirements)
-            if compatible: continue
-            stop = True
-            problems["greater_than" if greater_than else "else"][peer] = dependency_requirements
-        if stop: return dependency, dependency_version, problems
-    return None
+# region . ConflictChecker
+class ConflictChecker:
+    def __init__(self, package):
+        self.package = package
+        self.conflicts = {}
+        self.dirty = set()
+        for dependency in package: self.mark(dependency)
+
+    def mark(self, dependency):
+        node = self.package[dependency]
+        self.dirty.update((peer, dependency) for peer in node.required_by if peer != "<root>")
+        self.dirty.update((dependency, peer) for peer in node.peerDependencies)
+        self.dirty.update(edge for edge in self.conflicts if dependency in edge)
+
+    def check_edge(self, peer, dependency):
+        if peer not in self.package or dependency not in self.package: return None
+        if self.package[dependency].stale or self.package[peer].stale: return None
+        if peer not in self.package[dependency].required_by: return None
+        dependency_requirements = self.package[peer].peerDependencies.get(dependency)
+        if dependency_requirements is None: return None
+        compatible, greater_than = check_version_compatibility(self.package[dependency].version, dependency_requirements)
+        if compatible: return None
+        return dependency_requirements, greater_than
+
+    def check(self, dependency=None):
+        edges = self.dirty if dependency is None else {edge for edge in self.dirty if edge[1] == dependency}
+        for edge in edges:
+            self.conflicts.pop(edge, None)
+            conflict = self.check_edge(*edge)
+            if conflict: self.conflicts[edge] = conflict
+        self.dirty -= edges
+        problems = {}
+        for (peer, conflict_dependency), (dependency_requirements, greater_than) in self.conflicts.items():
+            if dependency is not None and conflict_dependency != dependency: continue
+            problems.setdefault(conflict_dependency, {"greater_than": {}, "else": {}})
+            problems[conflict_dependency]["greater_than" if greater_than else "else"][peer] = dependency_requirements
+        if dependency is not None:
+            return (dependency, self.package[dependency].version, problems[dependency]) if dependency in problems else None
+        package_order = {package_dependency: position for position, package_dependency in enumerate(self.package)}
+        return [
+            (conflict_dependency, self.package[conflict_dependency].version, problems[conflict_dependency])
+            for conflict_dependency in sorted(problems, key=package_order.get)
+        ]
+
+# region . update_dependency_version
+def update_dependency_version(
+    package, dependency, version, peerDependencies=None,
+    include_stale_dependencies=[],
+    latest_version_restrictions={},
+    conflict_checker=None
+):
+    if package[dependency].version == version: return package
+    previous_peerDependencies = package[dependency].peerDependencies
+    new_peerDependencies = peerDependencies or get_peerDependencies(dependency, version, mute=True)
+    package[dependency].version = version
+    package[dependency].peerDependencies = new_peerDependencies
+    for p in previous_peerDependencies:
+        if p not in new_peerDependencies:
+            package[p].required_by.pop(dependency, None)
+    for p in new_peerDependencies:
+        if p not in previous_peerDependencies:
+            if p not in package:
+                package_size = len(package)
+                console.print(f"\n{dependency}@{version} adds peerDependency {p}")
+                package = add_recursive_dependency_to_package(
+                    package, p, required_by=dependency,
+                    include_stale_dependencies=include_stale_dependencies,
+                    latest_version_restrictions=latest_version_restrictions)
+                if conflict_checker:
+                    for added_dependency in list(package)[package_size:]: conflict_checker.mark(added_dependency)
+            else:
+                package[p].required_by[dependency] = None
+    if conflict_checker: conflict_checker.mark(dependency)
+    return package
 
-# region . resolve_package_problems
-def resolve_package_problems(package_directory, package, package_problems, include_stale_dependencies=[]):
-
-    def _update_dependency_version(package_directory, package, dependency, version, peerDependencies=None, include_stale_dependencies=[]):
-        previous_peerDependencies = package[dependency]["peerDependencies"]
-        new_peerDependencies = peerDependencies or get_peerDependencies(package_directory, dependency, version, mute=True)
-        package[dependency]["version"] = version
-        package[dependency]["peerDependencies"] = new_peerDependencies
-        stale = False if dependency in include_stale_dependencies else is_dependency_stale(package_directory, dependency)
-        package[dependency]["stale"] = stale
-        for p in previous_peerDependencies:
-            if p not in new_peerDependencies:
-                if dependency in package[p]["required_by"]:
-                    package[p]["required_by"].remove(dependency)
-        for p in new_peerDependencies:
-            if p not in previous_peerDependencies:
-                if dependency not in package[p]["required_by"]:
-                    package[p]["required_by"].append(dependency)
-        return package
+# region . find_compatible_version
+def find_compatible_version(peer, dependency, dependency_version, versions):
+    lo, hi = 0, len(versions) - 1
+    result = None
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        version = versions[mid]
+        temp_peerDependencies = get_peerDependencies(peer, version, mute=True)
+        dependency_requirements = temp_peerDependencies.get(dependency)
+        if dependency_requirements is None:
+            hi = mid - 1
+            continue
+        compatible, greater_than = check_version_compatibility(dependency_version, dependency_requirements)
+        if compatible:
+            result = version
+            hi = mid - 1
+        else:
+            if greater_than: hi = mid - 1
+            else: lo = mid + 1
+    return result
 
+# region . resolve_package_problems
+def resolve_package_problems(
+    package, package_problems,
+    include_stale_dependencies=[],
+    latest_version_restrictions={},
+    conflict_checker=None
+):
     dependency, dependency_version, problems = package_problems
 
     # downgrade dependency to meet dependency_requirements
     if len(problems["greater_than"]) > 0:
         satisfied_peers = None
+        version_index = get_version_index(dependency)
         for peer, dependency_requirements in problems["greater_than"].items():
-            peers = []
-            for version in package[dependency]["versions"]:
-                if version > dependency_version: continue
-                if check_version_compatibility(version, dependency_requirements)[1]:
-                    if peer not in peers: peers.append(peer)
-                    continue
-                break
-            package = _update_dependency_version(package_directory, package, dependency, version, peerDependencies=None, include_stale_dependencies=include_stale_dependencies)
-            if len(peers) > 0:
-                satisfied_peers = peers
-        console.print(f"\ndowngraded {dependency}: {dependency_version} --> {version}")
-        for peer in satisfied_peers:
-            console.print(f"-- satisfied {peer}@{package[peer]["version"]} peerDependency: {dependency}@{problems["greater_than"][peer]}")
-
-    def _find_compatible_version(package_directory, peer, dependency, dependency_version, package):
-        versions = package[peer]["versions"]
-        lo, hi = 0, len(versions) - 1
-        result = None
-        while lo <= hi:
-            mid = (lo + hi) // 2
-            version = versions[mid]
-            temp_peerDependencies = get_peerDependencies(package_directory, peer, version, mute=True)
-            dependency_requirements = temp_peerDependencies.get(dependency)
-            if dependency_requirements is None:
-                hi = mid - 1
-                continue
-            compatible, greater_than = check_version_compatibility(dependency_version, dependency_requirements)
-            if compatible:
-                result = version
-                hi = mid - 1
-            else:
-                if greater_than: hi = mid - 1
-                else: lo = mid + 1
-        return result
+            # highest version not above the current one that satisfies, or sits below, the requirements
+            current_version = package[dependency].version
+            lowest_bounds = [interval[0][0] if interval[0] is not None else MIN_VERSION_KEY for interval in compile_range(dependency_requirements)]
+            candidates = [
+                version_index.highest(dependency_requirements, at_most=current_version),
+                version_index.highest_at_most(min(parse_version(current_version), max(lowest_bounds))),
+            ]
+            candidates = [candidate for candidate in candidates if candidate is not None]
+            version = max(candidates, key=parse_version) if candidates else version_index.versions[0]
+            package = update_dependency_version(
+                package, dependency, version, peerDependencies=None,
+                include_stale_dependencies=include_stale_dependencies,
+                latest_version_restrictions=latest_version_restrictions,
+                conflict_checker=conflict_checker)
+            satisfied_peers = [peer] if check_version_compatibility(version, dependency_requirements)[0] else []
+        if version != dependency_version: console.print(f"\ndowngraded {dependency}: {dependency_version} --> {version}")
+        for peer in satisfied_peers if version != dependency_version else []:
+            console.print(f"-- satisfied {peer}@{package[peer].version} peerDependency: {dependency}@{problems["greater_than"][peer]}")
 
     # downgrade peer to meet current dependency version
-    dependency_version = package[dependency]["version"]
+    dependency_version = package[dependency].version
     for peer, _ in problems["else"].items():
-        peer_version = package[peer]["version"]
-        peer_requirements = package[peer]["peerDependencies"][dependency]
-        version = _find_compatible_version(package_directory, peer, dependency, dependency_version, package)
-        if version:
+        peer_version = package[peer].version
+        peer_requirements = package[peer].peerDependencies[dependency]
+        version = find_compatible_version(peer, dependency, dependency_version, package[peer].versions)
+        if version and version != peer_version:
             console.print(f"\ndowngraded {peer}: {peer_version} --> {version}")
-            temp_peerDependencies = get_peerDependencies(package_directory, peer, version, mute=True)
-            package = _update_dependency_version(package_directory, package, peer, version, peerDependencies=temp_peerDependencies, include_stale_dependencies=include_stale_dependencies)
-            console.print(f"-- satisfies {peer}@{version} new peerDependency for {dependency}@{dependency_version}: {dependency}@{package[peer]["peerDependencies"][dependency]} (previous peerDependency: {dependency}@{peer_requirements})")
+            temp_peerDependencies = get_peerDependencies(peer, version, mute=True)
+            package = update_dependency_version(
+                package, peer, version, peerDependencies=temp_peerDependencies,
+                include_stale_dependencies=include_stale_dependencies,
+                latest_version_restrictions=latest_version_restrictions,
+                conflict_checker=conflict_checker)
+            console.print(f"-- satisfies {peer}@{version} new peerDependency for {dependency}@{dependency_version}: {dependency}@{package[peer].peerDependencies[dependency]} (previous peerDependency: {dependency}@{peer_requirements})")
 
     return package
 
+# region . solve_package_constraints
+def solve_package_constraints(package, include_stale_dependencies=[], latest_version_restrictions={}):
+
+    def _satisfies(version, dependency_requirements):
+        return check_version_compatibility(version, dependency_requirements)[0]
+
+    def _revise(requirements, domains, dependency, version, other):
+        dependency_requirements = requirements(dependency, version).get(other)
+        return tuple(
+            other_version for other_version in domains[other]
+            if (dependency_requirements is None or _satisfies(other_version, dependency_requirements))
+            and ((other_requirements := requirements(other, other_version).get(dependency)) is None or _satisfies(version, other_requirements))
+        )
+
+    def _search(requirements, component, domains, neighbors):
+        # depth-first over variables, smallest domain first, newest version first;
+        # forward checking keeps every unassigned domain consistent with the assigned versions,
+        # so a failed set of remaining domains is a reusable no-good
+        position = {dependency: index for index, dependency in enumerate(component)}
+        no_goods = set()
+
+        def _select(domains, assigned):
+            unassigned = [dependency for dependency in component if dependency not in assigned]
+            return min(unassigned, key=lambda dependency: (len(domains[dependency]), position[dependency])) if unassigned else None
+
+        def _key(domains, assigned):
+            return frozenset((dependency, domains[dependency]) for dependency in component if dependency not in assigned)
+
+        stack = [[domains, frozenset(), _select(domains, frozenset()), 0]]
+        while stack:
+            frame = stack[-1]
+            frame_domains, assigned, dependency, value_position = frame
+            if dependency is None: return {dependency: frame_domains[dependency][0] for dependency in component}
+            if value_position == len(frame_domains[dependency]):
+                no_goods.add(_key(frame_domains, assigned))
+                stack.pop()
+                continue
+            frame[3] += 1
+            version = frame_domains[dependency][value_position]
+            new_domains = {**frame_domains, dependency: (version,)}
+            new_assigned = assigned | {dependency}
+            for other in neighbors[dependency]:
+                if other in new_assigned: continue
+                new_domains[other] = _revise(requirements, new_domains, dependency, version, other)
+                if not new_domains[other]: break
+            else:
+                if _key(new_domains, new_assigned) not in no_goods:
+                    stack.append([new_domains, new_assigned, _select(new_domains, new_assigned), 0])
+        return None
+
+    def _explain(requirements, component, domains, neighbors):
+        core = list(component)
+        for dependency in component:
+            candidate = [core_dependency for core_dependency in core if core_dependency != dependency]
+            candidate_neighbors = {core_dependency: neighbors[core_dependency] & set(candidate) for core_dependency in candidate}
+            if _search(requirements, candidate, {core_dependency: domains[core_dependency] for core_dependency in candidate}, candidate_neighbors) is None:
+                core = candidate
+        console.print(f"\n[red]no versions satisfy the peerDependencies between: {", ".join(core)}[/red]")
+        for dependency in core:
+            newest_version, oldest_version = domains[dependency][0], domains[dependency][-1]
+            console.print(f"-- {dependency}: {oldest_version} ... {newest_version}")
+            for peer, dependency_requirements in requirements(dependency, newest_version).items():
+                if peer in core: console.print(f"   {dependency}@{newest_version} requires {peer}@{dependency_requirements}")
+
+    while True:
+        package_problems = ConflictChecker(package).check()
+        if not package_problems: return package, True
+
+        @functools.cache
+        def _requirements(dependency, version):
+            return {peer: dependency_requirements for peer, dependency_requirements in get_peerDependencies(dependency, version, mute=True).items() if peer in package and not package[peer].stale}
+
+        # only dependencies connected to a current conflict can change, so constraints are collected by walking
+        # out from the conflicts; everything outside keeps its version and is already consistent
+        domains, neighbors = {}, {}
+        frontier = {involved_dependency for dependency, _, problems in package_problems for involved_dependency in [dependency, *problems["greater_than"], *problems["else"]]}
+        while frontier:
+            for dependency in frontier:
+                node = package[dependency]
+                # a dependency with only prerelease versions has no candidates besides the one it is at
+                domains[dependency] = tuple(version for version in node.versions if parse_version(version) <= parse_version(node.version)) or (node.version,)
+                neighbors.setdefault(dependency, set())
+            prefetch_peerDependencies({dependency: domains[dependency] for dependency in frontier})
+            for dependency in frontier:
+                neighbors[dependency].update(peer for peer in package[dependency].required_by if peer in package and not package[peer].stale)
+                for version in domains[dependency]: neighbors[dependency].update(_requirements(dependency, version))
+                neighbors[dependency].discard(dependency)
+                for peer in neighbors[dependency]: neighbors.setdefault(peer, set()).add(dependency)
+            frontier = {peer for dependency in frontier for peer in neighbors[dependency]} - domains.keys()
+
+        solution, seen = {}, set()
+        for dependency in domains:
+            if dependency in seen: continue
+            component, frontier = [], [dependency]
+            seen.add(dependency)
+            while frontier:
+                component.append(frontier.pop())
+                for peer in neighbors[component[-1]] - seen:
+                    seen.add(peer)
+                    frontier.append(peer)
+            component_domains = {component_dependency: domains[component_dependency] for component_dependency in component}
+            component_solution = _search(_requirements, component, component_domains, neighbors)
+            if component_solution is None:
+                _explain(_requirements, component, component_domains, neighbors)
+                return package, False
+            solution.update(component_solution)
+
+        package_size = len(package)
+        for dependency in list(package)[:package_size]:
+            if dependency not in solution: continue
+            version, previous_version = solution[dependency], package[dependency].version
+            if version == previous_version: continue
+            package = update_dependency_version(
+                package, dependency, version, peerDependencies=None,
+                include_stale_dependencies=include_stale_dependencies,
+                latest_version_restrictions=latest_version_restrictions)
+            console.print(f"\ndowngraded {dependency}: {previous_version} --> {version}")
+        if len(package) == package_size: return package, True
+
+# region . resolve_package
+def resolve_package(package, include_stale_dependencies=[], latest_version_restrictions={}):
+    if SETTINGS["solver"] == "backtrack":
+        return solve_package_constraints(
+            package,
+            include_stale_dependencies=include_stale_dependencies,
+            latest_version_restrictions=latest_version_restrictions)
+
+    conflict_checker = ConflictChecker(package)
+    visited_states = set()
+    while package_problems := conflict_checker.check():
+        with PROFILER.span("phase", "resolve iteration", conflicts=len(package_problems)):
+            prefetch_conflict_peerDependencies(package, package_problems)
+            for dependency, _, _ in package_problems:
+                if dependency_problems := conflict_checker.check(dependency):
+                    package = resolve_package_problems(
+                        package, dependency_problems,
+                        include_stale_dependencies=include_stale_dependencies,
+                        latest_version_restrictions=latest_version_restrictions,
+                        conflict_checker=conflict_checker)
+        # no version changed this round, or the versions flip back to an earlier round
+        package_state = tuple((dependency, node.version) for dependency, node in package.items())
+        if conflict_checker.conflicts and (not conflict_checker.dirty or package_state in visited_states):
+            print_unresolved_conflicts(conflict_checker.check())
+            return package, False
+        visited_states.add(package_state)
+    return package, True
+
 # region -
 # region MAIN
 
@@ -490,39 +1716,191 @@ def resolve_package_problems(package_directory, package, package_problems, inclu
 
 
 
-# region -
-def main():
-    console.clear()
-    package_directory = select_package()
-    console.print(f"[bold blue]Working in:[/bold blue] {package_directory}")
-    backup_package(package_directory)
-
+# region . update_package
+def update_package(package_directory: pathlib.PosixPath):
+    import_legacy_npm_cache(package_directory)
+    package_json, package_json_format = read_package_json(package_directory)
+    latest_version_restrictions = get_latest_version_restrictions(package_json)
+    LOCAL_PACKAGES.clear()
+    if SETTINGS["lockfile"]:
+        LOCAL_PACKAGES.update(read_local_packages(package_directory, latest_version_restrictions))
+        console.print(f"seeded {len(LOCAL_PACKAGES)} installed dependencies from package-lock.json and node_modules")
+    get_version_index.cache_clear()
     include_stale_dependencies = []
-    package = {}
-    latest_version_restrictions = get_latest_version_restrictions(package_directory)
+    package = None
     console.print("finding package dependency versions and peerDependencies...")
 
-    for dependency in get_dependencies_list(package_directory):
-        package = add_recursive_dependency_to_package(
-            package_directory,
-            package, dependency, required_by="<root>",
+    dependencies = get_dependencies_list(package_json)
+    with PROFILER.span("phase", "discovery", package_directory=str(package_directory)):
+        if SETTINGS["incremental"]:
+            package = reuse_previous_package(
+                package_directory, dependencies,
+                include_stale_dependencies=include_stale_dependencies,
+                latest_version_restrictions=latest_version_restrictions)
+
+        if package is None:
+            package = {}
+            prefetch_dependency_graph(
+                dependencies,
+                include_stale_dependencies=include_stale_dependencies,
+                latest_version_restrictions=latest_version_restrictions)
+
+            for dependency in dependencies:
+                package = add_recursive_dependency_to_package(
+                    package, dependency, required_by="<root>",
+                    include_stale_dependencies=include_stale_dependencies,
+                    latest_version_restrictions=latest_version_restrictions)
+
+    with PROFILER.span("phase", "resolution", package_directory=str(package_directory)):
+        package, resolved = resolve_package(
+            package,
             include_stale_dependencies=include_stale_dependencies,
             latest_version_restrictions=latest_version_restrictions)
 
-    while package_problems := check_package_problems(package):
-        package = resolve_package_problems(
-            package_directory,
-            package, package_problems,
-            include_stale_dependencies=include_stale_dependencies)
-
-    write_package_peerDependencies(package_directory, package)
-    write_package_versions(package_directory, package)
-    print_added_peerDependencies(package_directory, package)
+    with PROFILER.span("phase", "write", package_directory=str(package_directory)):
+        write_package_peerDependencies(package_directory, package)
+        write_package_versions(package_directory, package)
+        write_package_snapshot(package_directory, dependencies, latest_version_restrictions, resolved)
+        package_diff = get_package_diff(package_json, package)
+        write_package_diff(package_directory, package_diff)
+    print_added_peerDependencies(dependencies, package)
     print_stale_dependencies(package)
-    overwrite_package(package_directory)
+    return package, resolved, package_json, package_json_format, package_diff
 
-if __name__ == "__main__":
+# region -
+@app.callback(invoke_without_command=True)
+def main(
+    ctx: typer.Context,
+    root: pathlib.Path = typer.Option(None, "--root", help=f"Project root to search for package.json files (default: nearest directory with one of {", ".join(PROJECT_ROOT_MARKERS)})."),
+    refresh: bool = typer.Option(False, "--refresh", help="Ignore cached versions, dist-tags and publish times."),
+    cache_directory: pathlib.Path = typer.Option(SETTINGS["cache_directory"], "--cache-dir", help="Directory of the shared npm metadata cache."),
+    cache_max_megabytes: int = typer.Option(SETTINGS["cache_max_megabytes"], "--cache-max-mb", help="Size above which least recently used cache entries are evicted."),
+    dist_tags_ttl: float = typer.Option(SETTINGS["ttl"]["dist-tags"] / 3600, "--dist-tags-ttl", help="Hours before cached versions and dist-tags expire."),
+    time_ttl: float = typer.Option(SETTINGS["ttl"]["last-publish"] / 3600, "--time-ttl", help="Hours before cached publish times expire."),
+    stale_after: float = typer.Option(SETTINGS["stale_after_days"], "--stale-after", help="Days without a new release after which a dependency is reported as stale and its peerDependencies are ignored."),
+    concurrency: int = typer.Option(SETTINGS["concurrency"], "--concurrency", min=1, help="Maximum number of parallel registry requests, shared by all batch workers."),
+    max_rps: float = typer.Option(SETTINGS["requests_per_second"], "--max-rps", min=0, help="Maximum registry requests per second, shared by all batch workers (0 for no limit)."),
+    retries: int = typer.Option(SETTINGS["retries"], "--retries", min=0, help="Retries with jittered backoff for registry timeouts, HTTP 429 and 5xx responses."),
+    backend: str = typer.Option(SETTINGS["backend"], "--backend", help=f"Registry metadata backend: auto, {", ".join(METADATA_BACKENDS)}. auto falls back to the npm CLI."),
+    solver: str = typer.Option(SETTINGS["solver"], "--solver", help="Conflict resolution engine: greedy (one conflict at a time) or backtrack (constraint solver)."),
+    lockfile: bool = typer.Option(False, "--lockfile", help="Seed versions and peerDependencies from package-lock.json and node_modules; installed dependencies reuse cached registry metadata of any age and only query the registry when the npm cache has none."),
+    incremental: bool = typer.Option(False, "--incremental", help="Reuse the previous package-peerDependencies.json and only re-solve dependencies affected by changes to package.json."),
+    offline: bool = typer.Option(False, "--offline", help="Never query the registry; answer from the npm cache, package-lock.json and node_modules (implies --lockfile)."),
+    profile: bool = typer.Option(False, "--profile", help="Print the time spent per phase, the slowest packages and the cache hit ratio."),
+    trace: pathlib.Path = typer.Option(None, "--trace", help="Write every phase, cache lookup and registry request to this Chrome trace JSON file."),
+):
+    SETTINGS["root"] = root
+    SETTINGS["refreshed_before"] = time.time() if refresh else 0
+    SETTINGS["cache_directory"] = cache_directory
+    SETTINGS["cache_max_megabytes"] = cache_max_megabytes
+    SETTINGS["ttl"] = {"versions": dist_tags_ttl * 3600, "dist-tags": dist_tags_ttl * 3600, "last-publish": time_ttl * 3600}
+    SETTINGS["stale_after_days"] = stale_after
+    SETTINGS["concurrency"] = concurrency
+    SETTINGS["requests_per_second"] = max_rps
+    SETTINGS["retries"] = retries
+    if backend != "auto" and backend not in METADATA_BACKENDS: raise typer.BadParameter(f"unknown backend {backend}", param_hint="--backend")
+    SETTINGS["backend"] = backend
+    if solver not in ("greedy", "backtrack"): raise typer.BadParameter(f"unknown solver {solver}", param_hint="--solver")
+    SETTINGS["solver"] = solver
+    SETTINGS["lockfile"] = lockfile or offline
+    SETTINGS["offline"] = offline
+    SETTINGS["incremental"] = incremental
+    if profile: ctx.call_on_close(print_profile)
+    if trace: ctx.call_on_close(lambda: PROFILER.write_trace(trace))
+
+    if ctx.invoked_subcommand is not None: return
+
+    console.clear()
+    package_directory = select_package()
+    console.print(f"[bold blue]Working in:[/bold blue] {package_directory}")
+    backup_package(package_directory)
+    package, _, package_json, package_json_format, _ = update_package(package_directory)
+    overwrite_package(package_directory, package, package_json, package_json_format)
+
+# region . batch
+@app.command()
+def batch(
+    patterns: list[str] = typer.Argument(None, help="Only update package directories (relative to the project root) matching these glob patterns."),
+    workers: int = typer.Option(os.cpu_count() or 1, "--workers", min=1, help="Number of packages updated in parallel (at most --concurrency)."),
+    overwrite: bool = typer.Option(True, "--overwrite/--no-overwrite", help="Write resolved versions back into each package.json."),
+    report: pathlib.Path = typer.Option(None, "--report", help="Write the added, upgraded, downgraded, pinned and stale dependencies of every package to this JSON file."),
+    timeout: int = typer.Option(0, "--timeout", min=0, help="Seconds after which updating a single package is given up and counted as failed (0 for no limit)."),
+):
+    with PROFILER.span("phase", "find_packages"):
+        package_directories = [package_path.parent for package_path in find_packages()]
+    if patterns:
+        package_directories = [
+            package_directory for package_directory in package_directories
+            if any(fnmatch.fnmatch(str(package_directory.relative_to(get_project_root())), pattern) for pattern in patterns)
+        ]
+    if len(package_directories) == 0:
+        console.print("[red]No package.json files found in the project.[/red]")
+        raise typer.Exit(code=1)
+
+    SETTINGS["inflight_directory"] = SETTINGS["cache_directory"] / "inflight"
+    SETTINGS["inflight_directory"].mkdir(parents=True, exist_ok=True)
+    failed_packages = []
+    package_diffs = {}
+    from concurrent.futures import ProcessPoolExecutor
+    # every worker process gets an equal share of the requests per second and concurrency budgets; a worker needs at
+    # least one concurrent request, so there are never more workers than --concurrency allows
+    worker_count = min(workers, len(package_directories), SETTINGS["concurrency"])
+    worker_settings = {
+        **SETTINGS,
+        "requests_per_second": SETTINGS["requests_per_second"] / worker_count,
+        "concurrency": SETTINGS["concurrency"] // worker_count,
+    }
+    with ProcessPoolExecutor(max_workers=worker_count, initializer=init_batch_worker, initargs=(worker_settings,)) as executor:
+        futures = [executor.submit(update_package_worker, package_directory, overwrite, timeout) for package_directory in package_directories]
+        for package_directory, future in zip(package_directories, futures):
+            relative_directory = str(package_directory.relative_to(get_project_root()))
+            console.rule(relative_directory)
+            try:
+                resolved, package_diff, output, spans = future.result()
+            except (Exception, PackageTimeout) as error:
+                console.print(f"[red]failed to update {package_directory}: {error}[/red]")
+                failed_packages.append(package_directory)
+                package_diffs[relative_directory] = {"resolved": False, "error": str(error)}
+                continue
+            console.out(output, end="", highlight=False)
+            PROFILER.spans.extend(spans)
+            package_diffs[relative_directory] = {"resolved": resolved, **package_diff}
+            if not resolved: failed_packages.append(package_directory)
+
+    if report: write_json_atomic(report, package_diffs, indent=None)
+
+    console.print(f"\nupdated {len(package_directories) - len(failed_packages)}/{len(package_directories)} packages")
+    if failed_packages:
+        console.print(f"[red]unresolved: {[str(package_directory.relative_to(get_project_root())) for package_directory in failed_packages]}[/red]")
+        raise typer.Exit(code=1)
+
+# region . init_batch_worker
+def init_batch_worker(settings):
+    global console
+    from rich.console import Console
+    SETTINGS.update(settings)
+    get_request_scheduler.cache_clear()
+    console = Console(file=io.StringIO(), record=True, width=120)
+    PROFILER.spans = []
+
+# region . update_package_worker
+def update_package_worker(package_directory: pathlib.PosixPath, overwrite, timeout=0):
+
+    def _timeout(signal_number, frame):
+        raise PackageTimeout(f"gave up after {timeout} seconds")
+
+    # the worker runs packages on its main thread, so an alarm interrupts a stuck update and frees the process
+    signal.signal(signal.SIGALRM, _timeout)
+    signal.alarm(timeout)
     try:
-        main()
-    except typer.Exit:
-        pass
+        backup_package(package_directory)
+        package, resolved, package_json, package_json_format, package_diff = update_package(package_directory)
+        if overwrite and resolved: write_package(package_directory, package, package_json, package_json_format)
+    finally:
+        signal.alarm(0)
+        get_npm_cache_store().flush()
+    spans, PROFILER.spans = PROFILER.spans, []
+    return resolved, package_diff, console.export_text(clear=True), spans
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,59 @@
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+import main
+
+# region . clear_caches
+def clear_caches():
+    for cached_function in [main.get_project_root, main.read_npmrc, main.get_npm_cache_store, main.get_metadata_backends, main.get_request_scheduler, main.get_version_index]:
+        cached_function.cache_clear()
+
+# region . settings
+@pytest.fixture(autouse=True)
+def settings(tmp_path, monkeypatch):
+    # every test gets its own project root, home directory, npm cache and registry configuration
+    (tmp_path / "home").mkdir()
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    for key in ["npm_config_registry", "NPM_CONFIG_REGISTRY"]: monkeypatch.delenv(key, raising=False)
+    monkeypatch.setattr(main, "SETTINGS", {**main.SETTINGS, "root": tmp_path, "cache_directory": tmp_path / "cache"})
+    monkeypatch.setattr(main, "RETRY_BASE_DELAY", 0)
+    monkeypatch.setattr(main, "LOCAL_PACKAGES", {})
+    clear_caches()
+    yield main.SETTINGS
+    clear_caches()
+
+# region . FixtureBackend
+class FixtureBackend:
+    # serves packuments in the metadata backend format from memory and records every request
+    fetches_whole_packument = True
+
+    def __init__(self):
+        self.packuments = {}
+        self.requests = []
+
+    def add_packument(self, name, versions, peerDependencies={}, latest=None, published="2026-01-01T00:00:00.000Z"):
+        self.packuments[name] = {
+            "versions": versions,
+            "dist-tags": {"latest": latest or versions[-1]},
+            "time": {version: published for version in versions},
+            "manifests": {version: ({"peerDependencies": peerDependencies[version]} if version in peerDependencies else {}) for version in versions},
+        }
+
+    def fetch_packument(self, dependency, full=False):
+        self.requests.append(dependency)
+        if dependency not in self.packuments: raise main.RegistryError(f"{dependency}: HTTP 404")
+        return {field: value for field, value in self.packuments[dependency].items() if full or field != "time"}
+
+    def fetch_manifest(self, dependency, version):
+        return self.fetch_packument(dependency)
+
+# region . fixture_backend
+@pytest.fixture
+def fixture_backend(settings, monkeypatch):
+    backend = FixtureBackend()
+    monkeypatch.setitem(main.METADATA_BACKENDS, "fixture", lambda: backend)
+    settings["backend"] = "fixture"
+    return backend
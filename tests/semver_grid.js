@@ -0,0 +1,15 @@
+// Regenerates semver_grid.json from node-semver, the reference for compile_range.
+// usage: node tests/semver_grid.js [path to node-semver, default: the copy bundled with npm]
+const fs = require("fs");
+const path = require("path");
+const { execSync } = require("child_process");
+
+const semverPath = process.argv[2] || path.join(execSync("npm root -g").toString().trim(), "npm", "node_modules", "semver");
+const semver = require(semverPath);
+const gridPath = path.join(__dirname, "semver_grid.json");
+const grid = JSON.parse(fs.readFileSync(gridPath));
+
+grid.node_semver = require(path.join(semverPath, "package.json")).version;
+grid.satisfies = Object.fromEntries(grid.ranges.map((range) => [range, grid.versions.filter((version) => semver.satisfies(version, range))]));
+fs.writeFileSync(gridPath, JSON.stringify(grid, null, 4) + "\n");
+console.log(`wrote ${gridPath}: ${grid.ranges.length} ranges x ${grid.versions.length} versions`);
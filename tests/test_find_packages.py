@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+import main
+
+# region . add_package
+def add_package(root, relative_directory):
+    (root / relative_directory).mkdir(parents=True, exist_ok=True)
+    (root / relative_directory / "package.json").write_text(json.dumps({"name": relative_directory}))
+
+# region . project
+@pytest.fixture
+def project(settings):
+    root = settings["root"]
+    root.joinpath("package.json").write_text(json.dumps({"workspaces": ["packages/*", "tools/**", "!tools/legacy"]}))
+    root.joinpath(".gitignore").write_text("generated/\n")
+    for relative_directory in [
+        "packages/ui", "packages/ui/nested", "packages/ui/node_modules/react", "packages/generated",
+        "tools/lint", "tools/lint/rules", "tools/legacy", "docs/site",
+    ]:
+        add_package(root, relative_directory)
+    return root
+
+# region -
+def test_workspace_globs(project):
+    package_paths = main.find_packages()
+    assert [str(package_path.parent.relative_to(project)) for package_path in package_paths] == [".", "packages/ui", "tools/lint", "tools/lint/rules"]
+
+def test_workspace_walk_skips_ignored_directories(project, monkeypatch):
+    scanned_directories = []
+    scandir = main.os.scandir
+    monkeypatch.setattr(main.os, "scandir", lambda path: scanned_directories.append(path) or scandir(path))
+    main.find_packages()
+    assert not any("node_modules" in path or "generated" in path for path in scanned_directories)
+
+@pytest.mark.parametrize("relative_path, pattern, expected", [
+    ("packages/ui/package.json", "packages/*/package.json", True),
+    ("packages/ui/nested/package.json", "packages/*/package.json", False),
+    ("packages/package.json", "packages/**/package.json", True),
+    ("packages/ui/nested/package.json", "packages/**/package.json", True),
+    ("apps/web-1/package.json", "apps/web-?/package.json", True),
+    ("apps.x/package.json", "apps/package.json", False),
+])
+def test_match_workspace_pattern(relative_path, pattern, expected):
+    assert main.match_workspace_pattern(relative_path, pattern) == expected
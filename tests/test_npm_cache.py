@@ -0,0 +1,84 @@
+import itertools
+
+import pytest
+
+import main
+
+VALUE = "x" * 98  # 100 bytes as JSON
+
+# region . clock
+@pytest.fixture
+def clock(monkeypatch):
+    # every call to time.time() is one second later, so fetch and access times are strictly ordered
+    ticks = itertools.count(1_000_000)
+    monkeypatch.setattr(main.time, "time", lambda: float(next(ticks)))
+
+# region . open_store
+def open_store(settings, max_bytes=1024 * 1024, refreshed_before=0):
+    return main.NpmCacheStore(settings["cache_directory"] / main.NPM_CACHE_FILE, max_bytes, refreshed_before=refreshed_before)
+
+# region -
+def test_entries_expire_after_ttl(settings, clock):
+    store = open_store(settings)
+    store.set("versions react", ["18.3.1"], fetched_at=main.time.time() - 100)
+    assert store.get("versions react", ttl=50) is None
+    assert store.get("versions react", ttl=500) == ["18.3.1"]
+    # no ttl, like --offline, accepts any age
+    assert store.get("versions react") == ["18.3.1"]
+
+def test_entries_persist_across_stores(settings):
+    store = open_store(settings)
+    store.set("dist-tags react", {"latest": "18.3.1"})
+    store.flush()
+    assert open_store(settings).get("dist-tags react", ttl=60) == {"latest": "18.3.1"}
+
+def test_refresh_ignores_entries_fetched_before_it(settings, clock):
+    store = open_store(settings)
+    store.set("versions react", ["18.3.1"])
+    store.flush()
+    refreshed_store = open_store(settings, refreshed_before=main.time.time())
+    assert refreshed_store.get("versions react", ttl=float("inf")) is None
+    assert refreshed_store.get("versions react") == ["18.3.1"]
+    refreshed_store.set("versions react", ["19.0.0"])
+    assert refreshed_store.get("versions react", ttl=float("inf")) == ["19.0.0"]
+
+def test_refresh_setting(settings):
+    settings["refreshed_before"] = main.time.time() + 60
+    main.get_npm_cache_store().set("versions react", ["18.3.1"], fetched_at=main.time.time())
+    assert main.get_npm_cache_store().get("versions react", ttl=3600) is None
+
+def test_evicts_least_recently_used(settings, clock):
+    store = open_store(settings, max_bytes=250)
+    store.set("a", VALUE)
+    store.set("b", VALUE)
+    store.flush()
+    assert store.get("a") == VALUE
+    store.set("c", VALUE)
+    store.flush()
+    assert sorted(store.index) == ["a", "c"]
+    assert sorted(key for key, in store.connection.execute("SELECT key FROM entries")) == ["a", "c"]
+    assert open_store(settings, max_bytes=250).get("b") is None
+
+def test_evicts_down_to_ninety_percent(settings, clock):
+    store = open_store(settings, max_bytes=1000)
+    for key in "abcdefghij":
+        store.set(key, VALUE)
+    store.flush()
+    store.set("k", VALUE)
+    store.flush()
+    assert sorted(store.index) == list("cdefghijk")
+
+def test_entry_evicted_by_another_process(settings, clock):
+    store = open_store(settings)
+    store.set("a", VALUE)
+    store.flush()
+    store.entries.clear()
+    other_store = open_store(settings, max_bytes=150)
+    other_store.set("b", VALUE)
+    other_store.flush()
+    assert "a" not in other_store.index
+    assert store.get("a", default="missing") == "missing"
+    assert "a" not in store.index
+    # the stale index entry is gone, so a refetch is written and read back normally
+    store.set("a", VALUE)
+    assert store.get("a") == VALUE
@@ -0,0 +1,25 @@
+import pytest
+
+import main
+
+# region . node
+def node(version):
+    return main.PackageNode([version], version, {}, ["<root>"], False)
+
+# region -
+@pytest.mark.parametrize("requested_version, version, expected", [
+    ("^17.0.0", "17.0.2", "pinned"),
+    ("^17.0.0", "18.3.1", "upgraded"),
+    ("^17.0.0", "16.14.0", "downgraded"),
+    (">=16.8.0 <18", "17.0.2", "pinned"),
+    ("^16.8.0 || ^18.0.0", "17.0.2", "downgraded"),
+    ("~1.2.3", "1.3.0", "upgraded"),
+    ("latest", "18.3.1", "changed"),
+])
+def test_package_diff_classifies_by_range(requested_version, version, expected):
+    package_diff = main.get_package_diff({"dependencies": {"react": requested_version}}, {"react": node(version)})
+    assert {key: value for key, value in package_diff.items() if value} == {expected: {"react": {"from": requested_version, "to": version}}}
+
+def test_package_diff_skips_unchanged_and_lists_added():
+    package_diff = main.get_package_diff({"dependencies": {"react": "18.3.1"}}, {"react": node("18.3.1"), "scheduler": node("0.23.2")})
+    assert {key: value for key, value in package_diff.items() if value} == {"added": {"scheduler": "0.23.2"}}
@@ -0,0 +1,201 @@
+import base64
+import gzip
+import http.server
+import json
+import threading
+import urllib.parse
+
+import pytest
+
+import main
+
+# region . FixtureRegistry
+class FixtureRegistry(http.server.ThreadingHTTPServer):
+    # a stand-in npm registry: serves packuments, records requests and can fail or drop connections on demand
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FixtureRegistryHandler)
+        self.packuments = {}
+        self.requests = []
+        self.failures = {}
+        self.gzip = False
+        self.close_connections = False
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/"
+
+    def add_packument(self, name, versions, peerDependencies={}, time=True):
+        self.packuments[name] = {
+            "name": name,
+            "dist-tags": {"latest": versions[-1]},
+            **({"time": {"modified": "2026-01-01T00:00:00.000Z", **{version: "2026-01-01T00:00:00.000Z" for version in versions}}} if time else {}),
+            "versions": {
+                version: {"name": name, "version": version, "readme": "...", **({"peerDependencies": peerDependencies[version]} if version in peerDependencies else {})}
+                for version in versions
+            },
+        }
+
+# region . FixtureRegistryHandler
+class FixtureRegistryHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        registry = self.server
+        name = urllib.parse.unquote(self.path.lstrip("/"))
+        registry.requests.append((name, dict(self.headers)))
+        if registry.failures.get(name):
+            status, body = registry.failures[name].pop(0), b'{"error": "unavailable"}'
+        elif name in registry.packuments:
+            status, body = 200, json.dumps(registry.packuments[name]).encode()
+        else:
+            status, body = 404, b'{"error": "Not found"}'
+        self.send_response(status)
+        if status == 200 and registry.gzip:
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        if status == 503: self.send_header("Retry-After", "0")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        # drop the connection without announcing it, like a registry closing idle keep-alive sockets
+        if registry.close_connections: self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+# region . start_registry
+def start_registry():
+    registry = FixtureRegistry()
+    threading.Thread(target=registry.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True).start()
+    return registry
+
+# region . registry
+@pytest.fixture
+def registry(settings, monkeypatch):
+    registry = start_registry()
+    registry.add_packument("react", ["17.0.2", "18.3.1"])
+    registry.add_packument("react-dom", ["17.0.2", "18.3.1"], {"17.0.2": {"react": "17.0.2"}, "18.3.1": {"react": "^18.3.1"}})
+    monkeypatch.setenv("npm_config_registry", registry.url)
+    settings["backend"] = "http"
+    yield registry
+    registry.shutdown()
+    registry.server_close()
+
+# region . FallbackBackend
+class FallbackBackend:
+    fetches_whole_packument = False
+    calls = []
+
+    def fetch_packument(self, dependency, full=False):
+        FallbackBackend.calls.append(dependency)
+        return {"versions": ["1.0.0"], "dist-tags": {"latest": "1.0.0"}}
+
+# region -
+def test_fetch_packument_requests_abbreviated_metadata(registry):
+    packument = main.HttpRegistryBackend().fetch_packument("react-dom")
+    _, headers = registry.requests[-1]
+    assert headers["Accept"].startswith("application/vnd.npm.install-v1+json")
+    assert packument["versions"] == ["17.0.2", "18.3.1"]
+    assert packument["dist-tags"] == {"latest": "18.3.1"}
+    assert packument["manifests"]["18.3.1"] == {"peerDependencies": {"react": "^18.3.1"}}
+
+def test_fetch_packument_full_requests_time(registry):
+    packument = main.HttpRegistryBackend().fetch_packument("react", full=True)
+    _, headers = registry.requests[-1]
+    assert headers["Accept"] == "application/json"
+    assert "18.3.1" in packument["time"]
+
+def test_fetch_packument_without_time(registry):
+    registry.add_packument("no-time", ["1.0.0"], time=False)
+    assert "time" not in main.HttpRegistryBackend().fetch_packument("no-time", full=True)
+    assert main.get_packument_field("no-time", "last-publish") == 0
+
+def test_gzip_response(registry):
+    registry.gzip = True
+    assert main.HttpRegistryBackend().fetch_packument("react")["versions"] == ["17.0.2", "18.3.1"]
+    _, headers = registry.requests[-1]
+    assert headers["Accept-Encoding"] == "gzip"
+
+def test_reconnects_after_server_closes_connection(registry):
+    registry.close_connections = True
+    backend = main.HttpRegistryBackend()
+    backend.fetch_packument("react")
+    connection = backend.local.pool["http", registry.url[len("http://"):-1]]
+    assert backend.fetch_packument("react-dom")["versions"] == ["17.0.2", "18.3.1"]
+    assert backend.local.pool["http", registry.url[len("http://"):-1]] is not connection
+
+@pytest.mark.parametrize("npmrc, authorization", [
+    ("{nerf_dart}:_authToken=${{REGISTRY_TOKEN}}", "Bearer secret"),
+    ("{nerf_dart}:_auth=dXNlcjpwYXNz", "Basic dXNlcjpwYXNz"),
+    (f"{{nerf_dart}}:username=user\n{{nerf_dart}}:_password={base64.b64encode(b"pass").decode()}", "Basic dXNlcjpwYXNz"),
+])
+def test_npmrc_credentials(registry, settings, monkeypatch, npmrc, authorization):
+    monkeypatch.setenv("REGISTRY_TOKEN", "secret")
+    nerf_dart = registry.url[len("http:"):]
+    (settings["root"] / ".npmrc").write_text("//other.example/:_authToken=wrong\n" + npmrc.format(nerf_dart=nerf_dart) + "\n")
+    main.HttpRegistryBackend().fetch_packument("react")
+    _, headers = registry.requests[-1]
+    assert headers["Authorization"] == authorization
+
+def test_scoped_registry(registry, settings):
+    scoped_registry = start_registry()
+    try:
+        scoped_registry.add_packument("@scope/ui", ["1.0.0"])
+        nerf_dart = scoped_registry.url[len("http:"):]
+        (settings["root"] / ".npmrc").write_text(f"@scope:registry={scoped_registry.url}\n{nerf_dart}:_authToken=scoped\n")
+        assert main.HttpRegistryBackend().fetch_packument("@scope/ui")["versions"] == ["1.0.0"]
+        assert [name for name, _ in scoped_registry.requests] == ["@scope/ui"]
+        assert scoped_registry.requests[0][1]["Authorization"] == "Bearer scoped"
+        assert registry.requests == []
+        assert main.HttpRegistryBackend().fetch_packument("react")
+        assert "Authorization" not in registry.requests[-1][1]
+    finally:
+        scoped_registry.shutdown()
+        scoped_registry.server_close()
+
+def test_not_found_falls_back_without_retry(registry, settings, monkeypatch):
+    monkeypatch.setitem(main.METADATA_BACKENDS, "npm", FallbackBackend)
+    FallbackBackend.calls = []
+    settings["backend"] = "auto"
+    assert main.fetch_metadata("fetch_packument", "missing")["versions"] == ["1.0.0"]
+    assert [name for name, _ in registry.requests] == ["missing"]
+    assert FallbackBackend.calls == ["missing"]
+
+def test_not_found_is_not_cached(registry):
+    with pytest.raises(main.RegistryError, match="HTTP 404"):
+        main.get_packument_field("missing", "versions")
+    registry.add_packument("missing", ["1.0.0"])
+    assert main.get_packument_field("missing", "versions") == ["1.0.0"]
+
+def test_unavailable_is_retried(registry):
+    registry.failures["react"] = [503, 503]
+    assert main.fetch_metadata("fetch_packument", "react")["versions"] == ["17.0.2", "18.3.1"]
+    assert [name for name, _ in registry.requests] == ["react"] * 3
+
+def test_unavailable_gives_up_after_retries(registry, settings):
+    settings["retries"] = 1
+    registry.failures["react"] = [503, 503, 503]
+    with pytest.raises(main.TransientRegistryError, match="HTTP 503"):
+        main.fetch_metadata("fetch_packument", "react")
+    assert len(registry.requests) == 2
+
+def test_installed_dependency_costs_one_request(registry, settings, monkeypatch):
+    settings["lockfile"] = True
+    settings["ttl"] = {"versions": 0, "dist-tags": 0, "last-publish": 0}
+    monkeypatch.setitem(main.LOCAL_PACKAGES, "react", {"17.0.2": {}})
+    for _ in range(2):
+        assert main.get_packument_field("react", "versions") == ["17.0.2", "18.3.1"]
+        assert main.get_packument_field("react", "dist-tags") == {"latest": "18.3.1"}
+        assert main.get_packument_field("react", "last-publish") > 0
+    assert len(registry.requests) == 1
+    _, headers = registry.requests[0]
+    assert headers["Accept"] == "application/json"
+
+def test_installed_dependency_refresh(registry, settings, monkeypatch):
+    settings["lockfile"] = True
+    monkeypatch.setitem(main.LOCAL_PACKAGES, "react", {"17.0.2": {}})
+    main.get_packument_field("react", "dist-tags")
+    main.get_npm_cache_store().refreshed_before = main.time.time() + 1
+    main.get_packument_field("react", "dist-tags")
+    assert len(registry.requests) == 2
@@ -0,0 +1,83 @@
+import pytest
+
+import main
+
+# region . resolve
+def resolve(settings, dependencies, solver):
+    settings["solver"] = solver
+    package = {}
+    for dependency in dependencies:
+        package = main.add_recursive_dependency_to_package(package, dependency, required_by="<root>")
+    package, resolved = main.resolve_package(package)
+    return {dependency: node.version for dependency, node in package.items()}, resolved
+
+# region . react_backend
+@pytest.fixture
+def react_backend(fixture_backend):
+    fixture_backend.add_packument("react", ["16.14.0", "17.0.2", "18.3.1"])
+    fixture_backend.add_packument("react-dom", ["17.0.2", "18.3.1"], {"17.0.2": {"react": "17.0.2"}, "18.3.1": {"react": "^18.3.1"}})
+    fixture_backend.add_packument("legacy-ui", ["1.0.0"], {"1.0.0": {"react": "^16.14.0 || ^17.0.0"}})
+    return fixture_backend
+
+# region -
+@pytest.mark.parametrize("solver", ["greedy", "backtrack"])
+def test_downgrades_to_satisfy_peerDependencies(settings, react_backend, solver):
+    versions, resolved = resolve(settings, ["react-dom", "legacy-ui", "react"], solver)
+    assert resolved
+    assert versions == {"react-dom": "17.0.2", "react": "17.0.2", "legacy-ui": "1.0.0"}
+
+@pytest.mark.parametrize("solver", ["greedy", "backtrack"])
+def test_prerelease_only_dependency_keeps_its_version(settings, react_backend, solver):
+    # get_versions drops prereleases, so the dependency has no candidate versions besides its dist-tag
+    react_backend.add_packument("editor", ["0.0.0-insiders.1", "0.0.0-insiders.2"], {"0.0.0-insiders.2": {"react": ">=17"}})
+    versions, resolved = resolve(settings, ["editor", "legacy-ui", "react"], solver)
+    assert resolved
+    assert versions == {"editor": "0.0.0-insiders.2", "react": "17.0.2", "legacy-ui": "1.0.0"}
+
+@pytest.mark.parametrize("solver", ["greedy", "backtrack"])
+def test_prerelease_only_dependency_in_unsatisfiable_conflict(settings, react_backend, solver):
+    react_backend.add_packument("editor", ["0.0.0-insiders.1", "0.0.0-insiders.2"], {"0.0.0-insiders.2": {"react": "^18.0.0"}})
+    _, resolved = resolve(settings, ["editor", "legacy-ui", "react"], solver)
+    assert not resolved
+
+def test_backtrack_leaves_unrelated_dependencies_alone(settings, react_backend, monkeypatch):
+    react_backend.add_packument("lodash", [f"4.17.{patch}" for patch in range(22)])
+    requested_manifests = []
+    get_peerDependencies = main.get_peerDependencies
+    monkeypatch.setattr(main, "get_peerDependencies", lambda dependency, version, mute=False: requested_manifests.append(dependency) or get_peerDependencies(dependency, version, mute))
+    versions, resolved = resolve(settings, ["lodash", "react-dom", "legacy-ui", "react"], "backtrack")
+    assert resolved
+    assert versions["lodash"] == "4.17.21"
+    assert requested_manifests.count("lodash") == 1
+
+def test_conflict_checker_reports_peer_conflicts(settings, react_backend):
+    package = {}
+    for dependency in ["react-dom", "legacy-ui", "react"]:
+        package = main.add_recursive_dependency_to_package(package, dependency, required_by="<root>")
+    assert main.ConflictChecker(package).check() == [("react", "18.3.1", {"greater_than": {"legacy-ui": "^16.14.0 || ^17.0.0"}, "else": {}})]
+
+def test_conflict_checker_rechecks_only_changed_edges(settings, react_backend):
+    package = {}
+    for dependency in ["react-dom", "react"]:
+        package = main.add_recursive_dependency_to_package(package, dependency, required_by="<root>")
+    conflict_checker = main.ConflictChecker(package)
+    assert conflict_checker.check() == []
+    assert not conflict_checker.dirty
+    package = main.update_dependency_version(package, "react", "17.0.2", conflict_checker=conflict_checker)
+    assert conflict_checker.check() == [("react", "17.0.2", {"greater_than": {}, "else": {"react-dom": "^18.3.1"}})]
+
+@pytest.mark.parametrize("solver", ["greedy", "backtrack"])
+def test_unsatisfiable_peerDependency_terminates(settings, fixture_backend, solver):
+    fixture_backend.add_packument("a", ["1.0.0"], {"1.0.0": {"b": "^1.0.0"}})
+    fixture_backend.add_packument("b", ["2.0.0", "3.0.0"])
+    versions, resolved = resolve(settings, ["a", "b"], solver)
+    assert not resolved
+    assert versions["a"] == "1.0.0"
+
+@pytest.mark.parametrize("solver", ["greedy", "backtrack"])
+def test_mutual_peerDependencies_terminate(settings, fixture_backend, solver):
+    # every version of one package asks for the version of the other that rejects it, so downgrades flip back and forth
+    fixture_backend.add_packument("a", ["1.0.0", "2.0.0"], {"1.0.0": {"b": "^2.0.0"}, "2.0.0": {"b": "^1.0.0"}})
+    fixture_backend.add_packument("b", ["1.0.0", "2.0.0"], {"1.0.0": {"a": "^1.0.0"}, "2.0.0": {"a": "^2.0.0"}})
+    _, resolved = resolve(settings, ["a", "b"], solver)
+    assert not resolved
@@ -0,0 +1,45 @@
+import json
+import pathlib
+
+import pytest
+
+import main
+
+# ranges x versions checked with node-semver's satisfies(); regenerate with `node tests/semver_grid.js`
+SEMVER_GRID = json.loads((pathlib.Path(__file__).parent / "semver_grid.json").read_text())
+
+# region . sort_descending
+def sort_descending(versions):
+    return sorted(versions, key=main.parse_version, reverse=True)
+
+# region -
+@pytest.mark.parametrize("semver_requirements", SEMVER_GRID["ranges"])
+def test_check_version_compatibility_matches_node_semver(semver_requirements):
+    satisfying_versions = [version for version in SEMVER_GRID["versions"] if main.check_version_compatibility(version, semver_requirements)[0]]
+    assert satisfying_versions == SEMVER_GRID["satisfies"][semver_requirements]
+
+@pytest.mark.parametrize("semver_requirements", SEMVER_GRID["ranges"])
+def test_version_index_matches_node_semver(semver_requirements):
+    version_index = main.VersionIndex(SEMVER_GRID["versions"])
+    expected_versions = sort_descending(SEMVER_GRID["satisfies"][semver_requirements])
+    assert version_index.matching(semver_requirements) == expected_versions
+    assert version_index.highest(semver_requirements) == (expected_versions[0] if expected_versions else None)
+
+@pytest.mark.parametrize("semver_requirements", SEMVER_GRID["ranges"])
+def test_grid_ranges_are_valid(semver_requirements):
+    assert main.is_valid_range(semver_requirements)
+
+@pytest.mark.parametrize("semver_requirements", ["latest", "next", "workspace:*", "file:../ui", "npm:react@^18", "github:facebook/react", "1.2.3 - latest"])
+def test_unparseable_ranges_are_invalid(semver_requirements):
+    assert not main.is_valid_range(semver_requirements)
+
+@pytest.mark.parametrize("semver_version, semver_requirements, expected", [
+    ("18.3.1", "^18.0.0", (True, None)),
+    ("19.0.0", "^18.0.0", (False, True)),
+    ("17.0.2", "^18.0.0", (False, False)),
+    ("17.0.2", "^16.8.0 || ^18.0.0", (False, False)),
+    ("19.0.0", "^16.8.0 || ^17.0.0", (False, True)),
+    ("18.0.0-rc.1", "^18.0.0", (False, False)),
+])
+def test_check_version_compatibility_direction(semver_version, semver_requirements, expected):
+    assert main.check_version_compatibility(semver_version, semver_requirements) == expected